@@ -0,0 +1,155 @@
+"""
+Query-plan benchmark for the hot lookups.
+
+Seeds a throwaway PostgreSQL schema with a large number of rooms and players,
+then prints EXPLAIN ANALYZE timings and the top plan node of every hot query
+without the secondary indexes and again with the indexes declared in models.py.
+
+Uses DATABASE_URL from the bot config unless --dsn is given; everything lives
+in the `bench_indexes` schema, which is dropped at the end (unless --keep):
+
+    python benchmarks/bench_indexes.py --rooms 200000 --players-per-room 8
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from pyvnytsya_bot.database.base import Base
+from pyvnytsya_bot.database import models # noqa: F401 (registers the tables)
+
+SCHEMA = "bench_indexes"
+
+# name -> SQL; {placeholders} are filled from seeded data
+HOT_QUERIES = {
+    "room by code": "SELECT * FROM rooms WHERE code = '{code}'",
+    "players of room": "SELECT * FROM players WHERE room_id IN ({room_id})",
+    "seat of user in room": "SELECT * FROM players WHERE user_id = {user_id} AND room_id = {room_id}",
+    "running game of user": (
+        "SELECT rooms.code FROM players JOIN rooms ON players.room_id = rooms.id "
+        "WHERE players.user_id = {user_id} AND rooms.is_active AND NOT rooms.is_finished"
+    ),
+    "active rooms rebuild": (
+        "SELECT players.user_id, rooms.code FROM players JOIN rooms ON players.room_id = rooms.id "
+        "WHERE rooms.is_active = true AND rooms.is_finished = false AND players.user_id > 0 ORDER BY rooms.id"
+    ),
+    "packs for user": "SELECT * FROM game_packs WHERE user_id = {user_id} OR is_public = true",
+    "rooms using pack": "SELECT count(*) FROM rooms WHERE pack_id = {pack_id}",
+}
+
+
+async def seed(conn, rooms, players_per_room, users, packs):
+    await conn.execute(text(
+        "INSERT INTO users (id, username, full_name) "
+        "SELECT g, 'user' || g, 'User ' || g FROM generate_series(1, :users) g"
+    ), {"users": users})
+    await conn.execute(text(
+        "INSERT INTO game_packs (user_id, name, data, is_public) "
+        "SELECT 1 + (g * 7919) % :users, 'Pack ' || g, '{}', g % 20 = 0 FROM generate_series(1, :packs) g"
+    ), {"users": users, "packs": packs})
+    # ~1% running, ~1% in registration, the rest finished (the realistic shape of the table)
+    await conn.execute(text(
+        "INSERT INTO rooms (code, creator_id, is_active, is_finished, round_number, phase, survivors_count, pack_id) "
+        "SELECT upper(lpad(to_hex(g), 6, '0')), 1 + (g * 31) % :users, g % 100 <> 1, g % 100 > 1, 1, "
+        "CASE WHEN g % 100 > 1 THEN 'finished' WHEN g % 100 = 0 THEN 'revealing' ELSE 'registration' END, 2, "
+        "CASE WHEN g % 3 = 0 THEN 1 + g % :packs END "
+        "FROM generate_series(1, :rooms) g"
+    ), {"users": users, "packs": packs, "rooms": rooms})
+    await conn.execute(text(
+        "INSERT INTO players (room_id, user_id, is_alive, revealed_mask, action_cards, has_voted, revealed_count_round, vote_weight) "
+        "SELECT r.id, 1 + (r.id * :per_room + k) % :users, true, 0, '[]', false, 0, 1 "
+        "FROM rooms r CROSS JOIN generate_series(0, :per_room - 1) k"
+    ), {"users": users, "per_room": players_per_room})
+
+
+async def sample_params(conn):
+    row = (await conn.execute(text(
+        "SELECT rooms.id, rooms.code, players.user_id FROM rooms JOIN players ON players.room_id = rooms.id "
+        "WHERE rooms.is_active AND NOT rooms.is_finished ORDER BY rooms.id DESC LIMIT 1"
+    ))).one()
+    pack_id = (await conn.execute(text("SELECT max(id) FROM game_packs"))).scalar()
+    return {"room_id": row.id, "code": row.code, "user_id": row.user_id, "pack_id": pack_id}
+
+
+async def explain(conn, sql, repeat):
+    """Best execution time (ms) over `repeat` runs and the top plan node."""
+    best, top = None, ""
+    for _ in range(repeat):
+        lines = [r[0] for r in await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"))]
+        ms = float(re.search(r"Execution Time: ([\d.]+) ms", "\n".join(lines)).group(1))
+        if best is None or ms < best:
+            best = ms
+            top = re.sub(r"\s+\(cost=.*", "", lines[0]).strip()
+    return best, top
+
+
+async def measure(conn, params, repeat):
+    results = {}
+    for name, sql in HOT_QUERIES.items():
+        results[name] = await explain(conn, sql.format(**params), repeat)
+    return results
+
+
+def secondary_indexes():
+    return [index for table in Base.metadata.sorted_tables for index in table.indexes]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", help="SQLAlchemy URL (postgresql+asyncpg://...), defaults to the bot config")
+    parser.add_argument("--rooms", type=int, default=200000)
+    parser.add_argument("--players-per-room", type=int, default=8)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--packs", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Don't drop the benchmark schema")
+    args = parser.parse_args()
+
+    dsn = args.dsn
+    if dsn is None:
+        from pyvnytsya_bot.config import config
+        dsn = config.DATABASE_URL
+
+    engine = create_async_engine(dsn, connect_args={"server_settings": {"search_path": SCHEMA}})
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            await conn.run_sync(Base.metadata.create_all)
+            # "Before": only primary keys and the unique rooms.code
+            for index in secondary_indexes():
+                await conn.execute(text(f"DROP INDEX {index.name}"))
+
+            print(f"Seeding {args.rooms} rooms x {args.players_per_room} players...")
+            await seed(conn, args.rooms, args.players_per_room, args.users, args.packs)
+            await conn.execute(text("ANALYZE"))
+            params = await sample_params(conn)
+            before = await measure(conn, params, args.repeat)
+
+            for index in secondary_indexes():
+                await conn.run_sync(index.create)
+            await conn.execute(text("ANALYZE"))
+            after = await measure(conn, params, args.repeat)
+
+            if not args.keep:
+                await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+        print(f"\n{'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name in HOT_QUERIES:
+            (b_ms, b_plan), (a_ms, a_plan) = before[name], after[name]
+            print(f"{name:<24}{b_ms:>12.3f}{a_ms:>12.3f}{b_ms / max(a_ms, 0.001):>9.1f}x")
+            print(f"  before: {b_plan}")
+            print(f"  after:  {a_plan}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+import timeit
+
+# Add project root to path
+sys.path.append(os.getcwd())
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Also sets up the environment the config needs
+from simulate_games import FakeBot, FakeCallback, FakeUser
+
+from pyvnytsya_bot.handlers import game
+from pyvnytsya_bot.keyboards.cache import keyboard_cache
+from pyvnytsya_bot.keyboards.callbacks import pack
+from pyvnytsya_bot.keyboards.inline import game_dashboard, reveal_menu, voting_menu, action_cards_menu
+from pyvnytsya_bot.services.room_cache import RoomView, room_cache
+from pyvnytsya_bot.utils.game_utils import deal_action_cards
+
+ROOM_SIZE = 12
+ROUNDS = 20000
+CODES = ["ROOM" + str(i) for i in range(20)]
+PHASES = ["revealing", "discussion", "voting"]
+
+
+class Obj:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def fake_room(code: str) -> RoomView:
+    players = [
+        Obj(
+            id=i + 1, user_id=1000 + i, room_id=1, profession="Лікар", health="Здоровий", hobby="Шахи",
+            phobia="Темрява", inventory="Ніж", fact="Факт", age=30, bio="Чоловік",
+            action_cards=deal_action_cards(), is_alive=True, revealed_mask=0, has_voted=False,
+            revealed_count_round=0, vote_weight=1, user=Obj(id=1000 + i, username=f"p{i}", full_name=f"Гравець {i}"),
+        )
+        for i in range(ROOM_SIZE)
+    ]
+    room = Obj(
+        id=1, code=code, creator_id=1000, is_active=True, is_finished=False, round_number=1,
+        phase="discussion", survivors_count=ROOM_SIZE // 2, scenario="**Катастрофа**: Тест.", pack_id=None,
+        players=players,
+    )
+    return room_cache.put(room)
+
+
+def dashboard_args():
+    return random.choice(CODES), random.choice(PHASES), random.random() > 0.2, random.random() > 0.8
+
+
+def bench(label, fn, rounds=ROUNDS):
+    seconds = timeit.timeit(fn, number=rounds)
+    print(f"{label:<40} {seconds / rounds * 1e6:10.1f} µs/call")
+    return seconds
+
+
+async def bench_refresh(rounds: int):
+    """refresh_game end to end: room cache read, dashboard markup, message edit (no DB)."""
+    bot = FakeBot()
+    calls = []
+    for _ in range(256):
+        code = random.choice(CODES)
+        user = FakeUser(1000 + random.randrange(ROOM_SIZE), "p")
+        calls.append((FakeCallback(bot, user, pack("refresh_game", code=code)), code))
+    started = time.perf_counter()
+    for i in range(rounds):
+        callback, code = calls[i % len(calls)]
+        await game.refresh_game(callback, session=None, code=code)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    random.seed(42)
+    views = [fake_room(code) for code in CODES]
+    inputs = [dashboard_args() for _ in range(1024)]
+    masks = [random.randrange(256) for _ in range(1024)]
+
+    print(f"Dashboard for {len(CODES)} rooms, {ROUNDS} renders:")
+    it = itertools.count()
+    old = bench("game_dashboard, built every time", lambda: game_dashboard.uncached(*inputs[next(it) % 1024]))
+    new = bench("game_dashboard, cached", lambda: game_dashboard(*inputs[next(it) % 1024]))
+    print(f"speedup: {old / new:.1f}x")
+
+    print("\nReveal menu:")
+    old = bench("reveal_menu, built every time", lambda: reveal_menu.uncached(CODES[0], masks[next(it) % 1024]))
+    new = bench("reveal_menu, cached", lambda: reveal_menu(CODES[0], masks[next(it) % 1024]))
+    print(f"speedup: {old / new:.1f}x")
+
+    print(f"\nPlayer-dependent menus ({ROOM_SIZE} players):")
+    view = views[0]
+    old = bench("voting_menu, built every time", lambda: voting_menu.uncached(view.code, view.players))
+    new = bench("voting_menu, cached by room version", lambda: voting_menu(view.code, view.players, version=view.version))
+    print(f"speedup: {old / new:.1f}x")
+    cards = view.players[0].action_cards
+    old = bench("action_cards_menu, built every time", lambda: action_cards_menu.uncached(view.code, cards))
+    new = bench("action_cards_menu, cached", lambda: action_cards_menu(view.code, cards))
+    print(f"speedup: {old / new:.1f}x")
+
+    print(f"\nrefresh_game handler, {ROUNDS // 4} calls:")
+    rounds = ROUNDS // 4
+    game_dashboard_cached = game.game_dashboard
+    game.game_dashboard = game_dashboard_cached.uncached
+    old = asyncio.run(bench_refresh(rounds))
+    game.game_dashboard = game_dashboard_cached
+    new = asyncio.run(bench_refresh(rounds))
+    print(f"{'built every time':<40} {old / rounds * 1e6:10.1f} µs/call")
+    print(f"{'cached':<40} {new / rounds * 1e6:10.1f} µs/call")
+    print(f"speedup: {old / new:.1f}x")
+    print(f"\nKeyboard cache: {len(keyboard_cache)} entries, {keyboard_cache.hits} hits, {keyboard_cache.misses} misses")
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import random
+import sys
+import time
+import timeit
+
+# Add project root to path
+sys.path.append(os.getcwd())
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Also sets up the environment the config needs
+from bench_keyboards import ROOM_SIZE, fake_room
+from simulate_games import FakeBot, FakeCallback, FakeUser
+
+from pyvnytsya_bot.handlers import game
+from pyvnytsya_bot.keyboards.callbacks import pack
+from pyvnytsya_bot.services.edit_tracker import edit_tracker
+from pyvnytsya_bot.services.render_cache import render_cache
+from pyvnytsya_bot.utils.game_utils import escape_markdown, format_player_card
+
+ROUNDS = 5000
+CODE = "TABLE1"
+MARKDOWN_ESCAPES = str.maketrans({"_": "\\_", "*": "\\*", "`": "\\`", "[": "\\["})
+
+
+def legacy_table(room):
+    # view_table before the render cache: every card formatted on every press
+    report = (
+        f"📋 *СТІЛ ГРАВЦІВ* | Раунд {room.round_number}\n"
+        f"➖➖➖➖➖➖➖➖➖➖\n\n"
+    )
+    for p in room.players:
+        report += format_player_card(p, show_hidden=False) + "\n"
+    return report
+
+
+def bench(label, fn, rounds=ROUNDS):
+    seconds = timeit.timeit(fn, number=rounds)
+    print(f"{label:<40} {seconds / rounds * 1e6:10.1f} µs/call")
+    return seconds
+
+
+async def mash_view_table(presses: int) -> int:
+    """One player pressing "Стіл гравців" on the same message; returns how many edits were sent."""
+    bot = FakeBot()
+    callback = FakeCallback(bot, FakeUser(1000, "p"), pack("view_table", code=CODE))
+    callback.message.message_id = 1
+    for _ in range(presses):
+        await game.view_table(callback, session=None, bot=bot, code=CODE)
+    return bot.calls["edit_message_text"]
+
+
+if __name__ == "__main__":
+    random.seed(42)
+    view = fake_room(CODE)
+
+    print(f"Player table, {ROOM_SIZE} players:")
+    assert legacy_table(view) == render_cache.table(view)
+    old = bench("formatted on every press", lambda: legacy_table(view))
+    new = bench("assembled from cached cards", lambda: render_cache.table(view))
+    print(f"speedup: {old / new:.1f}x")
+
+    print("\nOne player changes, the table is rendered again:")
+    def change_one():
+        player = random.choice(view.players)
+        player.version += 10**6 # what RoomCache.put does for a changed player
+        return render_cache.table(view)
+    bench("one card re-rendered", change_one)
+
+    started = time.perf_counter()
+    edits = asyncio.run(mash_view_table(100))
+    print(f"\n100 presses of the same table: {edits} edit(s) sent ({(time.perf_counter() - started) * 10:.2f} ms/press)")
+    print(f"Edit tracker: {edit_tracker.hits} skipped, {edit_tracker.misses} sent, {edit_tracker.debounced} debounced")
+
+    # Why escape_markdown keeps chained str.replace: translate() is slower on short Cyrillic names
+    print("\nescape_markdown on player names:")
+    names = [p.user.full_name for p in view.players] + ["snake_case*name", "Дід [Панас]"]
+    bench("chained str.replace", lambda: [escape_markdown(n) for n in names], rounds=ROUNDS * 4)
+    bench("str.translate", lambda: [str(n).translate(MARKDOWN_ESCAPES) for n in names], rounds=ROUNDS * 4)
@@ -0,0 +1,75 @@
+import random
+import sys
+import os
+import timeit
+from collections import Counter
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from pyvnytsya_bot.utils.game_utils import (
+    PROFESSIONS, HEALTH, HOBBIES, PHOBIAS, INVENTORY, FACTS, BIO,
+    TraitSampler, deal_characteristics,
+)
+
+ROOM_SIZE = 12
+ROUNDS = 2000
+
+def legacy_get_random_trait(traits_list):
+    # The implementation before alias tables: rebuilds lists and re-accumulates weights per call
+    if not traits_list: return "Нічого"
+
+    first = traits_list[0]
+    if isinstance(first, dict):
+        choices = [t["name"] for t in traits_list]
+        weights = [t.get("weight", 1) for t in traits_list]
+    else:
+        choices = [t[0] for t in traits_list]
+        weights = [t[1] for t in traits_list]
+
+    return random.choices(choices, weights=weights, k=1)[0]
+
+def legacy_deal(count):
+    return [{
+        "profession": legacy_get_random_trait(PROFESSIONS),
+        "health": legacy_get_random_trait(HEALTH),
+        "hobby": legacy_get_random_trait(HOBBIES),
+        "phobia": legacy_get_random_trait(PHOBIAS),
+        "inventory": legacy_get_random_trait(INVENTORY),
+        "fact": legacy_get_random_trait(FACTS),
+        "age": random.randint(18, 90),
+        "bio": legacy_get_random_trait(BIO),
+    } for _ in range(count)]
+
+def custom_pack(size):
+    return {key: [{"name": f"{key}-{i}", "weight": random.randint(1, 50)} for i in range(size)]
+            for key in ("professions", "health", "hobby", "phobia", "inventory", "fact", "bio")}
+
+def check_distribution(samples=200_000):
+    """Alias table frequencies should match the declared weights."""
+    sampler = TraitSampler(PROFESSIONS)
+    counts = Counter(sampler.sample() for _ in range(samples))
+    total = sum(w for _, w in PROFESSIONS)
+    worst = max(abs(counts[name] / samples - w / total) for name, w in PROFESSIONS)
+    print(f"Max frequency deviation over {samples} draws: {worst:.4%}")
+
+def bench(label, fn):
+    seconds = timeit.timeit(fn, number=ROUNDS)
+    print(f"{label:<40} {seconds / ROUNDS * 1e6:10.1f} µs/room")
+    return seconds
+
+if __name__ == "__main__":
+    random.seed(42)
+    check_distribution()
+
+    print(f"\nDealing a room of {ROOM_SIZE} players, {ROUNDS} rooms:")
+    old = bench("default tables, legacy", lambda: legacy_deal(ROOM_SIZE))
+    new = bench("default tables, alias", lambda: deal_characteristics(ROOM_SIZE))
+    print(f"speedup: {old / new:.1f}x")
+
+    pack = custom_pack(500)
+    legacy_pack = lambda: [{key: legacy_get_random_trait(pack[key]) for key in pack} for _ in range(ROOM_SIZE)]
+    print(f"\nCustom pack with 500 entries per list:")
+    old = bench("custom pack, legacy", legacy_pack)
+    new = bench("custom pack, alias (compile per room)", lambda: deal_characteristics(ROOM_SIZE, pack))
+    print(f"speedup: {old / new:.1f}x")
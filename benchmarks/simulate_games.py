@@ -0,0 +1,354 @@
+"""
+Headless game simulator.
+
+Drives the real handlers (menu -> start_game -> reveals -> start_discuss ->
+start_voting_phase -> process_vote -> finish_voting -> end_game) against an
+in-memory SQLite database, a fake Bot and a stub AI service, then reports
+games/sec, per-handler latency percentiles and DB statements per phase.
+
+Round and phase transitions must not scale with the room size: the simulator
+exits with status 1 if a handler in STATEMENT_BUDGET ever issues more
+statements than its budget (room load included).
+
+Needs `aiosqlite` in addition to the bot's requirements:
+
+    python benchmarks/simulate_games.py --games 50 --humans 4 --bots 8 --seed 1
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+# The config requires these; the simulator never talks to Telegram, Postgres or Gemini
+for key, value in {
+    "BOT_TOKEN": "0:simulator", "GEMINI_API_KEY": "simulator", "DB_HOST": "localhost",
+    "DB_PORT": "5432", "DB_USER": "simulator", "DB_PASS": "simulator", "DB_NAME": "simulator",
+}.items():
+    os.environ.setdefault(key, value)
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from pyvnytsya_bot.database.base import Base
+from pyvnytsya_bot.database.models import User
+from pyvnytsya_bot.handlers import callbacks, menu, game
+from pyvnytsya_bot.keyboards.callbacks import pack, unpack
+from pyvnytsya_bot.middlewares.db import DbSessionMiddleware
+from pyvnytsya_bot.services.broadcaster import broadcaster
+from pyvnytsya_bot.services.notifier import notifier
+from pyvnytsya_bot.services.edit_tracker import edit_tracker
+from pyvnytsya_bot.services.scenario_pool import scenario_pool
+from pyvnytsya_bot.utils.game_utils import TRAIT_KEYS, revealed_traits
+
+# handler -> max DB statements per call, whatever the number of players.
+# process_vote includes finish_voting: room load (3), the vote and has_voted (2),
+# who has voted (1), the round claim (1), all bot votes (1), the tally (1), room,
+# loser and revenge victim (3), the set-based player reset (1) and end_game's
+# pack lookup (1). finish_voting is the part of that from the round claim on.
+STATEMENT_BUDGET = {
+    "start_discuss": 5,
+    "start_voting_phase": 5,
+    "process_vote": 14,
+    "finish_voting": 8,
+}
+
+
+class StubAI:
+    async def generate_scenario(self, custom_prompt: str = None) -> str:
+        return "**Катастрофа**: Симуляція.\n**Бункер**: 50 м².\n**Умови**: 1 рік."
+
+    async def generate_scenarios(self, count: int, custom_prompt: str = None) -> list:
+        return [await self.generate_scenario(custom_prompt) for _ in range(count)]
+
+    async def generate_ending(self, survivors_info: str, scenario: str, custom_prompt: str = None) -> str:
+        return "Симуляція завершена. Група вижила."
+
+    async def generate_ending_stream(self, survivors_info: str, scenario: str, custom_prompt: str = None):
+        for chunk in (await self.generate_ending(survivors_info, scenario, custom_prompt)).split(" "):
+            yield chunk + " "
+
+
+class FakeBot:
+    """Records Bot API calls instead of performing them."""
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self._next_message_id = 0
+
+    def _message(self, chat_id, text=None):
+        self._next_message_id += 1
+        return FakeMessage(self, chat_id, self._next_message_id, text)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls["send_message"] += 1
+        return self._message(chat_id, text)
+
+    async def edit_message_text(self, text=None, chat_id=None, message_id=None, **kwargs):
+        self.calls["edit_message_text"] += 1
+        return True
+
+
+class FakeUser:
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.full_name = name
+        self.username = name
+
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+
+class FakeMessage:
+    def __init__(self, bot, chat_id, message_id=0, text=None, from_user=None):
+        self.bot = bot
+        self.chat = FakeChat(chat_id)
+        self.message_id = message_id
+        self.text = text
+        self.from_user = from_user
+
+    async def edit_text(self, text, **kwargs):
+        self.bot.calls["edit_message_text"] += 1
+        self.text = text
+        return self
+
+    async def answer(self, text, **kwargs):
+        return await self.bot.send_message(self.chat.id, text, **kwargs)
+
+    async def delete(self):
+        self.bot.calls["delete_message"] += 1
+        return True
+
+
+class FakeCallback:
+    def __init__(self, bot, user, data):
+        self.bot = bot
+        self.from_user = user
+        self.data = data
+        self.message = FakeMessage(bot, user.id)
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        self.bot.calls["answer_callback_query"] += 1
+        return True
+
+
+class FakeState:
+    async def clear(self):
+        pass
+
+    async def set_state(self, state=None):
+        pass
+
+
+class Stats:
+    def __init__(self):
+        self.latency = defaultdict(list) # handler -> [seconds]
+        self.statements = defaultdict(int) # phase -> count
+        self.per_call = defaultdict(list) # handler -> [statements per call]
+        self.current = 0
+        self.phase_runs = defaultdict(int)
+        self.phase = "setup"
+
+    def percentile(self, values, q):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Simulator:
+    def __init__(self, humans: int, bots: int):
+        self.humans = humans
+        self.bots = bots
+        self.stats = Stats()
+        self.bot = FakeBot()
+
+    async def setup(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+        @event.listens_for(self.engine.sync_engine, "before_cursor_execute")
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            self.stats.statements[self.stats.phase] += 1
+            self.stats.current += 1
+
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session_pool = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.db_middleware = DbSessionMiddleware(session_pool=self.session_pool)
+
+        game.ai_service = StubAI()
+        scenario_pool.ai = game.ai_service
+        broadcaster.set_limits(global_rate=1e9, per_chat_rate=1e9, per_chat_burst=1e9)
+
+    async def call(self, handler, event, **kwargs):
+        """Runs a handler through DbSessionMiddleware (and callbacks through their dispatcher), like aiogram does."""
+        target = handler
+        if isinstance(event, FakeCallback):
+            action, _ = unpack(event.data)
+            assert callbacks.handlers[action].callback is handler, f"{action} is not routed to {handler.__name__}"
+            target = callbacks.dispatch_callback
+
+        async def run(event, data):
+            return await target(event, **data)
+
+        started = time.perf_counter()
+        self.stats.current = 0
+        await self.db_middleware(run, event, dict(kwargs))
+        self.stats.latency[handler.__name__].append(time.perf_counter() - started)
+        self.stats.per_call[handler.__name__].append(self.stats.current)
+
+    def measure(self, name, fn):
+        """Wraps a coroutine function called inside handlers, recording its statements under `name`."""
+        async def measured(*args, **kwargs):
+            before = self.stats.current
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.stats.per_call[name].append(self.stats.current - before)
+        return measured
+
+    def set_phase(self, phase):
+        self.stats.phase = phase
+        self.stats.phase_runs[phase] += 1
+
+    async def load_room(self, code):
+        # The driver's own reads are counted separately from the phase they happen in
+        phase, self.stats.phase = self.stats.phase, "(driver)"
+        try:
+            async with self.session_pool() as session:
+                return await game.get_room_with_players(session, code)
+        finally:
+            self.stats.phase = phase
+
+    async def play(self, game_no: int):
+        self.set_phase("lobby")
+        base_id = (game_no + 1) * 1000
+        users = [FakeUser(base_id + i, f"Гравець {game_no}-{i}") for i in range(self.humans)]
+        async with self.session_pool() as session:
+            session.add_all(User(id=u.id, username=u.username, full_name=u.full_name) for u in users)
+            await session.commit()
+
+        creator = users[0]
+        callback = FakeCallback(self.bot, creator, pack("create_room"))
+        await self.call(menu.create_room, callback)
+        code = callback.message.text.split("`")[1] # "🔑 Код кімнати: `CODE`"
+
+        for user in users[1:]:
+            message = FakeMessage(self.bot, user.id, text=code, from_user=user)
+            await self.call(menu.join_room_process, message, state=FakeState())
+        for _ in range(self.bots):
+            await self.call(menu.add_bot, FakeCallback(self.bot, creator, pack("add_bot", code=code)))
+
+        self.set_phase("start_game")
+        await self.call(game.start_game, FakeCallback(self.bot, creator, pack("start_game", code=code)), bot=self.bot)
+
+        for _ in range(self.humans + self.bots):
+            room = await self.load_room(code)
+            if room.is_finished:
+                break
+
+            self.set_phase("reveal")
+            limit = 2 if room.round_number == 1 else 1
+            for player in room.players:
+                if player.user_id < 0 or not player.is_alive:
+                    continue
+                user = next(u for u in users if u.id == player.user_id)
+                revealed = revealed_traits(player.revealed_mask)
+                hidden = [t for t in TRAIT_KEYS if t not in revealed]
+                for trait in random.sample(hidden, min(limit, len(hidden))):
+                    await self.call(game.process_reveal, FakeCallback(self.bot, user, pack("reveal", trait=trait, code=code)), bot=self.bot)
+
+            self.set_phase("discussion")
+            await self.call(game.start_discuss, FakeCallback(self.bot, creator, pack("start_discuss", code=code)), bot=self.bot)
+            await self.call(game.refresh_game, FakeCallback(self.bot, creator, pack("refresh_game", code=code)))
+            await self.call(game.view_table, FakeCallback(self.bot, creator, pack("view_table", code=code)), bot=self.bot)
+
+            self.set_phase("voting")
+            await self.call(game.start_voting_phase, FakeCallback(self.bot, creator, pack("force_vote", code=code)), bot=self.bot)
+            room = await self.load_room(code)
+            alive = [p for p in room.players if p.is_alive]
+            for player in alive:
+                if player.user_id < 0:
+                    continue
+                user = next(u for u in users if u.id == player.user_id)
+                target = random.choice([p for p in alive if p.id != player.id])
+                await self.call(game.process_vote, FakeCallback(self.bot, user, pack("vote", target_id=target.id, code=code)), bot=self.bot)
+
+        self.set_phase("finished")
+        room = await self.load_room(code)
+        return room.is_finished
+
+    def report(self, games: int, finished: int, elapsed: float):
+        s = self.stats
+        print(f"Games: {games} ({finished} finished), {self.humans} humans + {self.bots} bots each")
+        print(f"Throughput: {games / elapsed:.2f} games/sec ({elapsed:.2f}s total)")
+        middleware = self.db_middleware
+        print(f"Updates that needed the DB: {middleware.db_updates} of {middleware.updates}")
+        print(f"Notifications: {notifier.events} to players, {notifier.sends} messages sent ({notifier.saved} saved)")
+
+        print("\nHandler latency (ms):")
+        print(f"  {'handler':<22}{'calls':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for name, values in sorted(s.latency.items()):
+            p50, p95, p99 = (s.percentile(values, q) * 1000 for q in (0.5, 0.95, 0.99))
+            print(f"  {name:<22}{len(values):>8}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}")
+
+        print("\nDB statements per call (max / budget):")
+        for name, counts in sorted(s.per_call.items()):
+            print(f"  {name:<22}{max(counts):>8}{STATEMENT_BUDGET.get(name, ''):>8}")
+
+        print("\nDB statements per phase:")
+        for phase, count in s.statements.items():
+            runs = s.phase_runs.get(phase) or 1
+            print(f"  {phase:<22}{count:>8} total {count / runs:>10.1f} per run")
+
+        print("\nBot API calls:")
+        for method, count in sorted(self.bot.calls.items()):
+            print(f"  {method:<22}{count:>8}")
+
+    def over_budget(self) -> list:
+        return [
+            f"{name}: {max(self.stats.per_call[name])} statements (budget {budget})"
+            for name, budget in STATEMENT_BUDGET.items()
+            if self.stats.per_call.get(name) and max(self.stats.per_call[name]) > budget
+        ]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--humans", type=int, default=4)
+    parser.add_argument("--bots", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sim = Simulator(args.humans, args.bots)
+    await sim.setup()
+    game.finish_voting = sim.measure("finish_voting", game.finish_voting)
+
+    finished = 0
+    started = time.perf_counter()
+    for game_no in range(args.games):
+        random.seed(args.seed + game_no)
+        finished += await sim.play(game_no)
+    await notifier.close()
+    await edit_tracker.close()
+    elapsed = time.perf_counter() - started
+
+    sim.report(args.games, finished, elapsed)
+    await scenario_pool.close()
+    await sim.engine.dispose()
+
+    violations = sim.over_budget()
+    for violation in violations:
+        print(f"OVER BUDGET {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
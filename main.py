@@ -3,12 +3,20 @@ import logging
 import sys
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
 from pyvnytsya_bot.config import config
-from pyvnytsya_bot.handlers import common, menu, game
+from pyvnytsya_bot.handlers import common, menu, game, callbacks
 from pyvnytsya_bot.database.engine import init_db, async_session
 from pyvnytsya_bot.middlewares.db import DbSessionMiddleware
+from pyvnytsya_bot.middlewares.room_actor import RoomActorMiddleware
+from pyvnytsya_bot.services.active_rooms import active_rooms
+from pyvnytsya_bot.services.scenario_pool import scenario_pool
+from pyvnytsya_bot.services.room_actors import room_actors
+from pyvnytsya_bot.services.notifier import notifier
+from pyvnytsya_bot.services.edit_tracker import edit_tracker
+from pyvnytsya_bot.services.stats import format_stats, log_stats_periodically
+from pyvnytsya_bot.services.fsm_storage import create_fsm_storage
+from pyvnytsya_bot.webhook import run_webhook
 
 async def main():
     logging.basicConfig(
@@ -18,20 +26,50 @@ async def main():
 
     # Initialize DB
     await init_db()
+    async with async_session() as session:
+        await active_rooms.rebuild(session)
 
     bot = Bot(token=config.BOT_TOKEN.get_secret_value())
-    dp = Dispatcher(storage=MemoryStorage())
+    dp = Dispatcher(storage=create_fsm_storage(config))
 
     # Middlewares
-    dp.update.middleware(DbSessionMiddleware(session_pool=async_session))
+    db_middleware = DbSessionMiddleware(session_pool=async_session)
+    dp.update.middleware(db_middleware)
+    dp["db_middleware"] = db_middleware # for /stats
+    # Serialize state-changing updates per room (outer: runs before any router's filters)
+    dp.callback_query.outer_middleware(RoomActorMiddleware(room_actors))
+    dp.message.outer_middleware(RoomActorMiddleware(room_actors))
 
     # Routers
     dp.include_router(common.router)
     dp.include_router(menu.router)
     dp.include_router(game.router)
+    # Every callback button, routed by opcode to the handlers registered above
+    dp.include_router(callbacks.router)
 
-    logging.info("Bot started!")
-    await dp.start_polling(bot)
+    # Send pending notifications and message edits while the bot session is still open
+    dp.shutdown.register(notifier.close)
+    dp.shutdown.register(edit_tracker.close)
+
+    # Start generating default scenarios right away
+    scenario_pool.warm()
+
+    stats_task = None
+    if config.STATS_LOG_INTERVAL > 0:
+        stats_task = asyncio.create_task(log_stats_periodically(config.STATS_LOG_INTERVAL, db_middleware))
+
+    logging.info(f"Bot started ({config.RUN_MODE})!")
+    try:
+        if config.RUN_MODE == "webhook":
+            await run_webhook(dp, bot, config)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        if stats_task:
+            stats_task.cancel()
+        await scenario_pool.close()
+        await room_actors.close()
+        logging.info(format_stats(db_middleware).replace("\n", " | "))
 
 if __name__ == "__main__":
     if sys.platform == "win32":
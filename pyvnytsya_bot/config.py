@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import SecretStr
 
@@ -10,6 +12,56 @@ class Settings(BaseSettings):
     DB_PASS: SecretStr
     DB_NAME: str
 
+    # Gemini requests: global concurrency limit and per-request deadlines (seconds)
+    AI_MAX_CONCURRENCY: int = 8
+    AI_TIMEOUT: float = 20.0
+    AI_ENDING_TIMEOUT: float = 30.0
+
+    # Ready-made scenarios kept warm per prompt, so game start doesn't wait on Gemini
+    SCENARIO_POOL_SIZE: int = 3
+    SCENARIO_POOL_CONCURRENCY: int = 2
+    SCENARIO_BATCH_SIZE: int = 3
+
+    # Connection pool. DB_PGBOUNCER=true for PgBouncer in transaction mode
+    # (no prepared statement cache, unique prepared statement names)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PGBOUNCER: bool = False
+
+    # FSM storage: "memory" (single worker) or "redis" (shared, needs the redis package).
+    # Unfinished flows expire FSM_TTL seconds after the last change
+    FSM_STORAGE: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    FSM_TTL: int = 3600
+    FSM_MAX_KEYS: int = 10000
+
+    # How updates arrive: "polling" (development) or "webhook" (embedded aiohttp server).
+    # WEBHOOK_URL is the public base URL registered with Telegram (leave empty to skip registration)
+    RUN_MODE: str = "polling"
+    WEBHOOK_URL: str = ""
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: Optional[SecretStr] = None
+    WEBAPP_HOST: str = "0.0.0.0"
+    WEBAPP_PORT: int = 8080
+    WEBHOOK_DRAIN_TIMEOUT: float = 30.0
+
+    # Bot processes serving the same bot and database (webhook workers behind a load balancer).
+    # With more than one, per-process caches that can't see other workers' writes are turned off
+    WORKERS: int = 1
+
+    # Game notifications to the same player within this many seconds are merged into one message (0 = off)
+    NOTIFY_WINDOW: float = 1.0
+
+    # Edits of the same message within this many seconds are collapsed into the latest one (0 = off)
+    EDIT_DEBOUNCE: float = 0.5
+
+    # Telegram ids allowed to use /stats (JSON list, e.g. [123, 456]); periodic stats log (seconds, 0 = off)
+    ADMIN_IDS: list[int] = []
+    STATS_LOG_INTERVAL: int = 300
+
     @property
     def DATABASE_URL(self):
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS.get_secret_value()}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
@@ -1,10 +1,39 @@
+from uuid import uuid4
+
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from ..config import config
 from .base import Base
+from .migrations import run_migrations
+from .pool import InstrumentedQueuePool, instrument
+
+connect_args = {}
+url = config.DATABASE_URL
+if config.DB_PGBOUNCER:
+    # PgBouncer (transaction mode) hands each transaction to any server connection,
+    # so prepared statements can't be cached and their names must never collide
+    url += "?prepared_statement_cache_size=0"
+    connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+else:
+    url += f"?prepared_statement_cache_size={config.DB_STATEMENT_CACHE_SIZE}"
 
-engine = create_async_engine(config.DATABASE_URL, echo=False)
+engine = create_async_engine(
+    url,
+    echo=False,
+    poolclass=InstrumentedQueuePool,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
+    pool_recycle=config.DB_POOL_RECYCLE,
+    connect_args=connect_args,
+)
+instrument(engine)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all doesn't touch existing tables
+        await conn.run_sync(run_migrations)
@@ -0,0 +1,78 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from ..utils.game_utils import traits_to_mask
+from .base import Base
+
+logger = logging.getLogger(__name__)
+
+
+def compact_players(conn):
+    """
+    players.revealed_traits (comma separated string) -> players.revealed_mask (integer bitmask),
+    players.action_cards TEXT -> JSONB on PostgreSQL. Safe to run on every start.
+    """
+    inspector = inspect(conn)
+    if not inspector.has_table("players"):
+        return
+    columns = {column["name"]: column for column in inspector.get_columns("players")}
+
+    if "revealed_mask" not in columns:
+        conn.execute(text("ALTER TABLE players ADD COLUMN revealed_mask INTEGER DEFAULT 0"))
+
+    if "revealed_traits" in columns:
+        rows = conn.execute(text("SELECT id, revealed_traits FROM players WHERE revealed_traits <> ''")).all()
+        updates = [{"id": player_id, "mask": traits_to_mask(traits)} for player_id, traits in rows]
+        if updates:
+            conn.execute(text("UPDATE players SET revealed_mask = :mask WHERE id = :id"), updates)
+        conn.execute(text("ALTER TABLE players DROP COLUMN revealed_traits"))
+        logger.info(f"Migrated revealed traits of {len(updates)} players to a bitmask")
+
+    if conn.dialect.name == "postgresql" and not isinstance(columns["action_cards"]["type"], JSONB):
+        conn.execute(text(
+            "ALTER TABLE players ALTER COLUMN action_cards TYPE JSONB "
+            "USING COALESCE(NULLIF(action_cards, ''), '[]')::jsonb"
+        ))
+        logger.info("Migrated players.action_cards to JSONB")
+
+
+def vote_columns(conn):
+    """Per-round votes moved to the votes table: players.votes_received -> players.vote_weight."""
+    inspector = inspect(conn)
+    if not inspector.has_table("players"):
+        return
+    columns = {column["name"] for column in inspector.get_columns("players")}
+    if "vote_weight" not in columns:
+        conn.execute(text("ALTER TABLE players ADD COLUMN vote_weight INTEGER DEFAULT 1"))
+    if "votes_received" in columns:
+        conn.execute(text("ALTER TABLE players DROP COLUMN votes_received"))
+
+
+def create_indexes(conn):
+    """Indexes declared in the models that are missing on tables created before them."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.name == "uq_players_room_user":
+                # Older versions could seat the same user twice, keep the first seat
+                result = conn.execute(text(
+                    "DELETE FROM players WHERE id NOT IN "
+                    "(SELECT MIN(id) FROM players GROUP BY room_id, user_id)"
+                ))
+                if result.rowcount:
+                    logger.info(f"Removed {result.rowcount} duplicate player seats")
+            index.create(conn)
+            logger.info(f"Created index {index.name}")
+
+
+def run_migrations(conn):
+    compact_players(conn)
+    vote_columns(conn)
+    create_indexes(conn)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, Boolean, Text, JSON, Index, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -29,6 +30,13 @@ class Room(Base):
     players = relationship("Player", back_populates="room", cascade="all, delete-orphan")
     pack = relationship("GamePack")
 
+    __table_args__ = (
+        # code is already indexed by its unique constraint.
+        # Running games are a tiny slice of the table: index only those
+        Index("ix_rooms_running", "id", postgresql_where=text("is_active AND NOT is_finished"), sqlite_where=text("is_active AND NOT is_finished")),
+        Index("ix_rooms_pack_id", "pack_id"),
+    )
+
 class GamePack(Base):
     __tablename__ = "game_packs"
 
@@ -39,6 +47,12 @@ class GamePack(Base):
     data = Column(Text, nullable=False) # JSON string
     is_public = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # "my packs OR public packs" is answered with a BitmapOr of these two
+        Index("ix_game_packs_user_id", "user_id"),
+        Index("ix_game_packs_public", "id", postgresql_where=text("is_public"), sqlite_where=text("is_public")),
+    )
+
 class Player(Base):
     __tablename__ = "players"
 
@@ -55,14 +69,36 @@ class Player(Base):
     fact = Column(String, nullable=True)
     age = Column(Integer, nullable=True) # Added Age
     bio = Column(String, nullable=True) # Gender/Bio
-    action_cards = Column(Text, default="[]") # JSON list of cards
+    action_cards = Column(JSON().with_variant(JSONB, "postgresql"), default=list) # List of cards with "used" flags
     
     # Game State
     is_alive = Column(Boolean, default=True)
-    revealed_traits = Column(String, default="") # Comma separated: "profession,health"
+    revealed_mask = Column(Integer, default=0) # Bitmask over TRAIT_KEYS (see utils.game_utils)
     has_voted = Column(Boolean, default=False)
     revealed_count_round = Column(Integer, default=0) # Cards revealed in current round
-    votes_received = Column(Integer, default=0)
+    vote_weight = Column(Integer, default=1) # Weight of this player's next vote (📢 Гучномовець sets 2)
     
     room = relationship("Room", back_populates="players")
     user = relationship("User")
+
+    __table_args__ = (
+        # One seat per user per room; also serves every "players of this room" lookup
+        Index("uq_players_room_user", "room_id", "user_id", unique=True),
+        Index("ix_players_user_id", "user_id"),
+    )
+
+
+class Vote(Base):
+    __tablename__ = "votes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    room_id = Column(Integer, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False)
+    round_number = Column(Integer, nullable=False)
+    voter_id = Column(Integer, ForeignKey("players.id", ondelete="CASCADE"), nullable=False)
+    target_id = Column(Integer, ForeignKey("players.id", ondelete="CASCADE"), nullable=False)
+    weight = Column(Integer, default=1, nullable=False)
+
+    __table_args__ = (
+        # One vote per voter per round; also the index the tally query runs on
+        UniqueConstraint("room_id", "round_number", "voter_id", name="uq_votes_voter_round"),
+    )
@@ -0,0 +1,97 @@
+import time
+
+from sqlalchemy import exc, event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    """
+    Counters for connection checkouts and SQLAlchemy's compiled SQL cache. The
+    latter is not asyncpg's prepared statement cache: it keeps hitting even with
+    DB_PGBOUNCER, where prepared statements are never cached.
+    """
+
+    def __init__(self):
+        self.pool = None
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.waited = 0 # checkouts that took longer than 10 ms
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.overflow_peak = 0
+        self.compiled_cache_hits = 0
+        self.compiled_cache_misses = 0
+
+    def record_checkout(self, seconds: float, overflow: int):
+        self.checkouts += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        if seconds > 0.01:
+            self.waited += 1
+        self.overflow_peak = max(self.overflow_peak, overflow)
+
+    def record_compiled_cache(self, cache_hit):
+        if cache_hit is CacheStats.CACHE_HIT:
+            self.compiled_cache_hits += 1
+        elif cache_hit is CacheStats.CACHE_MISS:
+            self.compiled_cache_misses += 1
+
+    def snapshot(self) -> dict:
+        lookups = self.compiled_cache_hits + self.compiled_cache_misses
+        stats = {
+            "checkouts": self.checkouts,
+            "waited": self.waited,
+            "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+            "timeouts": self.timeouts,
+            "overflow_peak": self.overflow_peak,
+            "compiled_cache_hit_rate": self.compiled_cache_hits / lookups if lookups else 0.0,
+        }
+        if self.pool is not None:
+            stats.update(
+                size=self.pool.size(),
+                checked_out=self.pool.checkedout(),
+                overflow=max(0, self.pool.overflow()),
+            )
+        return stats
+
+    def format(self) -> str:
+        s = self.snapshot()
+        return (
+            f"pool {s.get('checked_out', 0)}/{s.get('size', 0)} checked out, overflow {s.get('overflow', 0)} "
+            f"(peak {s['overflow_peak']}), {s['checkouts']} checkouts, {s['waited']} waited, "
+            f"wait avg {s['wait_avg_ms']:.1f} ms / max {s['wait_max_ms']:.1f} ms, {s['timeouts']} timeouts, "
+            f"compiled SQL cache hit rate {s['compiled_cache_hit_rate']:.1%}"
+        )
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that reports checkout wait times, overflow and timeouts to pool_metrics."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - started, self.overflow())
+        return connection
+
+
+def instrument(engine):
+    """Hooks pool_metrics up to an (async) engine created with InstrumentedQueuePool."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool_metrics.pool = sync_engine.pool
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def count_compiled_cache_hit(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            pool_metrics.record_compiled_cache(context.cache_hit)
@@ -1 +1 @@
-from . import common, menu, game
+from . import common, menu, game, callbacks
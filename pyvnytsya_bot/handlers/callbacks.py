@@ -0,0 +1,47 @@
+import logging
+
+from aiogram import Router, types
+from aiogram.dispatcher.event.handler import CallableObject
+
+from ..keyboards.callbacks import ACTIONS, unpack
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# action -> handler; filled by @on_callback
+handlers = {}
+
+
+def on_callback(action: str):
+    """
+    Registers the handler for a callback action. The payload fields are passed as
+    keyword arguments next to the usual ones (session, bot, state, ...); like
+    aiogram, only the ones the handler asks for are passed.
+    """
+    if action not in ACTIONS:
+        raise KeyError(f"Unknown callback action: {action}")
+
+    def register(handler):
+        if action in handlers:
+            raise ValueError(f"Callback action {action} already has a handler")
+        handlers[action] = CallableObject(handler)
+        return handler
+    return register
+
+
+@router.callback_query()
+async def dispatch_callback(callback: types.CallbackQuery, **data):
+    """The only callback handler: one dict lookup by opcode instead of a filter per handler."""
+    try:
+        action, fields = data.get("callback_payload") or unpack(callback.data)
+    except ValueError:
+        await callback.answer("Ця кнопка застаріла. Відкрийте меню ще раз.", show_alert=True)
+        return
+
+    handler = handlers.get(action)
+    if handler is None:
+        logger.debug(f"No handler for callback action {action}")
+        await callback.answer()
+        return
+    return await handler.call(callback, **data, **fields)
@@ -1,12 +1,16 @@
 from aiogram import Router, types
-from aiogram.filters import CommandStart
+from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from ..database.models import User
+from .callbacks import on_callback
 from ..keyboards.inline import main_menu
 from ..states.game_states import Registration
+from ..services.room_cache import room_cache
+from ..services.stats import format_stats
+from ..config import config
 
 router = Router()
 
@@ -47,6 +51,7 @@ async def process_nickname(message: types.Message, session: AsyncSession, state:
     if user:
         user.full_name = nickname
         await session.commit()
+        room_cache.invalidate_user(user.id)
         
     await state.clear()
     await message.answer(
@@ -55,7 +60,7 @@ async def process_nickname(message: types.Message, session: AsyncSession, state:
         reply_markup=main_menu()
     )
 
-@router.callback_query(lambda c: c.data == "main_menu")
+@on_callback("main_menu")
 async def back_to_main_menu(callback: types.CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.message.edit_text(
@@ -63,6 +68,13 @@ async def back_to_main_menu(callback: types.CallbackQuery, state: FSMContext):
         reply_markup=main_menu()
     )
 
-@router.callback_query(lambda c: c.data == "rules")
+@on_callback("rules")
 async def show_rules(callback: types.CallbackQuery):
     await callback.answer("Правила прості: вижити в бункері! (Деталі згодом)", show_alert=True)
+
+@router.message(Command("stats"))
+async def cmd_stats(message: types.Message, db_middleware=None):
+    """Pool, cache and AI counters. Only for ADMIN_IDS."""
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+    await message.answer(format_stats(db_middleware))
@@ -1,6 +1,4 @@
 from aiogram import Router, types, F, Bot
-from aiogram.exceptions import TelegramBadRequest
-from contextlib import suppress
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from sqlalchemy.orm import selectinload
@@ -13,27 +11,32 @@ logger = logging.getLogger(__name__)
 from ..database.models import Room, Player
 from ..services.gemini import ai_service
 from ..services.bot_ai import bot_ai
-from ..utils.game_utils import generate_characteristics, format_player_card, escape_markdown, ACTION_CARDS
+from ..services.broadcaster import broadcaster
+from ..services.notifier import notifier
+from ..services.room_cache import room_cache
+from ..services.render_cache import render_cache
+from ..services.edit_tracker import edit_tracker
+from ..services.active_rooms import active_rooms
+from ..services.pack_cache import pack_cache
+from ..services.scenario_pool import scenario_pool
+from ..services.live_message import LiveMessage
+from ..services.votes import cast_vote, cast_votes, tally, voter_ids, pick_loser
+from ..utils.game_utils import (
+    deal_characteristics, deal_action_cards, use_card, escape_markdown,
+    TRAIT_KEYS, ALL_TRAITS_MASK, revealed_traits, reveal_trait, hide_trait, ACTION_CARDS,
+)
+from .callbacks import on_callback
 from ..keyboards.inline import game_dashboard, reveal_menu, voting_menu, admin_game_menu, main_menu, action_cards_menu, target_selection_menu
-import json
 
 router = Router()
 
 async def send_long_message(bot: Bot, chat_id: int, text: str, parse_mode: str = "Markdown", reply_markup=None):
     """Splits long messages into chunks of 4096 characters."""
-    MAX_LENGTH = 4096
-    
-    if len(text) <= MAX_LENGTH:
-        await bot.send_message(chat_id, text, parse_mode=parse_mode, reply_markup=reply_markup)
-        return
+    await broadcaster.send(bot, chat_id, text, parse_mode=parse_mode, reply_markup=reply_markup)
 
-    # Split by chunks
-    chunks = [text[i:i+MAX_LENGTH] for i in range(0, len(text), MAX_LENGTH)]
-    
-    for i, chunk in enumerate(chunks):
-        # Only attach markup to the last chunk
-        markup = reply_markup if i == len(chunks) - 1 else None
-        await bot.send_message(chat_id, chunk, parse_mode=parse_mode, reply_markup=markup)
+def real_player_ids(room, alive_only=False):
+    """Telegram ids of human players in the room (bots have negative ids)."""
+    return [p.user_id for p in room.players if p.user_id > 0 and (p.is_alive or not alive_only)]
 
 async def get_room_with_players(session, code):
     result = await session.execute(
@@ -41,15 +44,37 @@ async def get_room_with_players(session, code):
     )
     return result.scalar_one_or_none()
 
-@router.callback_query(F.data.startswith("start_game_"))
-async def start_game(callback: types.CallbackQuery, session: AsyncSession, bot: Bot):
-    code = callback.data.split("_")[2]
+async def update_players(session: AsyncSession, room, **values):
+    """One set-based UPDATE for every player in the room; loaded Player objects are synced in place."""
+    await session.execute(
+        update(Player).where(Player.room_id == room.id).values(**values),
+        execution_options={"synchronize_session": "evaluate"},
+    )
+
+async def get_room_view(session, code):
+    """Read-only room snapshot for handlers that don't write. Served from the room cache when possible."""
+    view = room_cache.get(code)
+    if view is None:
+        # A writer may commit and put the room while we read it: don't overwrite that
+        generation = room_cache.generation(code)
+        room = await get_room_with_players(session, code)
+        if room:
+            view = room_cache.fill(room, generation)
+    return view
+
+@on_callback("start_game")
+async def start_game(callback: types.CallbackQuery, session: AsyncSession, bot: Bot, code: str):
     room = await get_room_with_players(session, code)
     
     if not room or room.creator_id != callback.from_user.id:
         await callback.answer("Помилка доступу.", show_alert=True)
         return
 
+    # A second press (queued behind the first in the room's actor) must not start it again
+    if room.is_active or room.is_finished:
+        await callback.answer("Гра вже почалася.", show_alert=True)
+        return
+
     players_count = len(room.players)
     if players_count < 2: # Allow 2 for testing
         await callback.answer("Замало гравців!", show_alert=True)
@@ -58,29 +83,12 @@ async def start_game(callback: types.CallbackQuery, session: AsyncSession, bot:
     await callback.message.edit_text("⏳ Генерую світ та характеристики... Зачекайте.")
 
     # Load Pack Data if exists
-    pack_data = None
-    pack_prompts = {}
-    if room.pack_id:
-        from ..database.models import GamePack
-        import json
-        pack_res = await session.execute(select(GamePack).where(GamePack.id == room.pack_id))
-        pack = pack_res.scalar_one_or_none()
-        if pack:
-            try:
-                full_pack = json.loads(pack.data)
-                pack_data = full_pack.get("data", {})
-                pack_prompts = full_pack.get("ai_prompts", {})
-                
-                # Fallback for legacy packs (if data was saved as just the inner dict)
-                if not pack_data and "professions" in full_pack:
-                     pack_data = full_pack
-            except:
-                print("Failed to load pack data")
+    pack = await pack_cache.get(session, room.pack_id) if room.pack_id else None
 
     # Generate Scenario
     try:
-        scenario_prompt = pack_prompts.get("scenario_prompt")
-        scenario = await ai_service.generate_scenario(custom_prompt=scenario_prompt)
+        scenario_prompt = pack.scenario_prompt if pack else None
+        scenario = await scenario_pool.get(scenario_prompt)
     except Exception as e:
         scenario = "Сталася помилка генерації сценарію. Уявіть, що настав зомбі-апокаліпсис."
         print(f"AI Error: {e}")
@@ -92,11 +100,8 @@ async def start_game(callback: types.CallbackQuery, session: AsyncSession, bot:
     room.survivors_count = max(1, players_count // 2) # Half survive
     
     # Assign characteristics
-    from ..utils.game_utils import get_random_action_cards
-    import json
-    
-    for player in room.players:
-        chars = generate_characteristics(pack_data)
+    dealt = deal_characteristics(len(room.players), samplers=pack.samplers if pack else None)
+    for player, chars in zip(room.players, dealt):
         player.profession = chars["profession"]
         player.health = chars["health"]
         player.hobby = chars["hobby"]
@@ -107,51 +112,40 @@ async def start_game(callback: types.CallbackQuery, session: AsyncSession, bot:
         player.bio = chars["bio"]
         
         # Assign Action Cards
-        cards_def = get_random_action_cards()
-        # Add state
-        cards = []
-        for c in cards_def:
-            c_copy = c.copy()
-            c_copy["used"] = False
-            cards.append(c_copy)
-            
-        player.action_cards = json.dumps(cards)
+        player.action_cards = deal_action_cards()
         
         player.is_alive = True
-        player.revealed_traits = ""
+        player.revealed_mask = 0
         player.revealed_count_round = 0
     
     await session.commit()
+    room_cache.put(room)
+    active_rooms.add_room(code, real_player_ids(room))
     
     # Notify all players
-    for player in room.players:
-        if player.user_id < 0: continue # Skip bots
-        
-        is_admin = (player.user_id == room.creator_id)
-        
-        try:
-            # Send scenario separately to avoid message length limits
-            # Convert AI double asterisks to single for legacy Markdown
-            safe_scenario = scenario.replace("**", "*")
-            await send_long_message(bot, player.user_id, f"📜 *Сценарій:*\n{safe_scenario}", parse_mode="Markdown")
-            
-            msg = (
-                f"☢️ *ГРА ПОЧАЛАСЯ!* ☢️\n\n"
-                f"🎯 *Ціль:* Вижити має {room.survivors_count} людей.\n"
-                f"🔢 *Раунд 1:* Відкрийте 2 характеристики!"
-            )
-            await bot.send_message(player.user_id, msg, parse_mode="Markdown", reply_markup=game_dashboard(code, phase="revealing", is_admin=is_admin))
-        except Exception as e:
-            print(f"Failed to send to {player.user_id}: {e}")
+    # Convert AI double asterisks to single for legacy Markdown
+    safe_scenario = scenario.replace("**", "*")
+    msg = (
+        f"☢️ *ГРА ПОЧАЛАСЯ!* ☢️\n\n"
+        f"🎯 *Ціль:* Вижити має {room.survivors_count} людей.\n"
+        f"🔢 *Раунд 1:* Відкрийте 2 характеристики!"
+    )
+
+    async def notify(user_id):
+        is_admin = (user_id == room.creator_id)
+        # Send scenario separately to avoid message length limits
+        await send_long_message(bot, user_id, f"📜 *Сценарій:*\n{safe_scenario}", parse_mode="Markdown")
+        await broadcaster.send(bot, user_id, msg, parse_mode="Markdown", reply_markup=game_dashboard(code, phase="revealing", is_admin=is_admin))
+
+    await broadcaster.fan_out(real_player_ids(room), notify)
 
     await callback.message.delete() # Remove old admin panel message
 
 # --- Reveal Logic ---
 
-@router.callback_query(F.data.startswith("reveal_menu_"))
-async def open_reveal_menu(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[2]
-    room = await get_room_with_players(session, code)
+@on_callback("reveal_menu")
+async def open_reveal_menu(callback: types.CallbackQuery, session: AsyncSession, code: str):
+    room = await get_room_view(session, code)
     
     player = next((p for p in room.players if p.user_id == callback.from_user.id), None)
     if not player or not player.is_alive:
@@ -167,18 +161,10 @@ async def open_reveal_menu(callback: types.CallbackQuery, session: AsyncSession)
         await callback.answer(f"Ви вже відкрили {limit} карт(и) в цьому раунді!", show_alert=True)
         return
 
-    revealed = player.revealed_traits.split(",") if player.revealed_traits else []
-    await callback.message.edit_text("Виберіть характеристику для відкриття:", reply_markup=reveal_menu(code, revealed))
-
-@router.callback_query(F.data.startswith("reveal_"))
-async def process_reveal(callback: types.CallbackQuery, session: AsyncSession, bot: Bot):
-    # data format: reveal_{trait}_{code}
-    parts = callback.data.split("_")
-    trait = parts[1]
-    code = parts[2]
-    
-    if trait == "menu": return # Handle edge case if pattern matches reveal_menu
+    await callback.message.edit_text("Виберіть характеристику для відкриття:", reply_markup=reveal_menu(code, player.revealed_mask))
 
+@on_callback("reveal")
+async def process_reveal(callback: types.CallbackQuery, session: AsyncSession, bot: Bot, trait: str, code: str):
     room = await get_room_with_players(session, code)
     player = next((p for p in room.players if p.user_id == callback.from_user.id), None)
     
@@ -192,12 +178,11 @@ async def process_reveal(callback: types.CallbackQuery, session: AsyncSession, b
         return
 
     # Update DB
-    current_revealed = player.revealed_traits.split(",") if player.revealed_traits else []
-    if trait not in current_revealed:
-        current_revealed.append(trait)
-        player.revealed_traits = ",".join(current_revealed)
+    if trait in TRAIT_KEYS and trait not in revealed_traits(player.revealed_mask):
+        player.revealed_mask = reveal_trait(player.revealed_mask, trait)
         player.revealed_count_round += 1
         await session.commit()
+        room_cache.put(room)
         
         trait_name = {
             "profession": "Професію", "health": "Здоров'я", "hobby": "Хобі",
@@ -208,20 +193,15 @@ async def process_reveal(callback: types.CallbackQuery, session: AsyncSession, b
         # Notify everyone
         safe_name = escape_markdown(player.user.full_name or player.user.username)
         notification = f"📢 *{safe_name}* відкрив *{trait_name}*!"
-        for p in room.players:
-            if p.user_id > 0:
-                try:
-                    await bot.send_message(p.user_id, notification, parse_mode="Markdown")
-                except: pass
+        await notifier.notify(bot, real_player_ids(room), notification, room=code)
     
     is_admin = (player.user_id == room.creator_id)
     await callback.message.edit_text("✅ Карта відкрита!", reply_markup=game_dashboard(code, phase=room.phase, is_admin=is_admin))
     
     await session.commit()
 
-@router.callback_query(F.data.startswith("start_discuss_"))
-async def start_discuss(callback: types.CallbackQuery, session: AsyncSession, bot: Bot):
-    code = callback.data.split("_")[2]
+@on_callback("start_discuss")
+async def start_discuss(callback: types.CallbackQuery, session: AsyncSession, bot: Bot, code: str):
     room = await get_room_with_players(session, code)
     
     if room.creator_id != callback.from_user.id:
@@ -236,14 +216,12 @@ async def start_discuss(callback: types.CallbackQuery, session: AsyncSession, bo
     
     for bot_player in alive_bots:
         while bot_player.revealed_count_round < limit:
-            all_traits = ["profession", "health", "hobby", "phobia", "inventory", "fact", "bio", "age"]
-            bot_revealed = bot_player.revealed_traits.split(",") if bot_player.revealed_traits else []
-            available = [t for t in all_traits if t not in bot_revealed]
+            bot_revealed = revealed_traits(bot_player.revealed_mask)
+            available = [t for t in TRAIT_KEYS if t not in bot_revealed]
             
             if available:
                 chosen = random.choice(available)
-                bot_revealed.append(chosen)
-                bot_player.revealed_traits = ",".join(bot_revealed)
+                bot_player.revealed_mask = reveal_trait(bot_player.revealed_mask, chosen)
                 bot_player.revealed_count_round += 1
                 
                 trait_name = {
@@ -258,24 +236,23 @@ async def start_discuss(callback: types.CallbackQuery, session: AsyncSession, bo
 
     room.phase = "discussion"
     await session.commit()
+    room_cache.put(room)
     
     msg = "🗣 *Етап обговорення!*\nАргументуйте, чому ви маєте вижити, і хто має піти."
     if bot_updates:
         msg += "\n\n" + "\n".join(bot_updates)
     
-    for p in room.players:
-        if p.user_id > 0:
-            try:
-                is_admin = (p.user_id == room.creator_id)
-                await bot.send_message(p.user_id, msg, parse_mode="Markdown", reply_markup=game_dashboard(code, phase="discussion", is_alive=p.is_alive, is_admin=is_admin))
-            except: pass
-            
+    alive = {p.user_id: p.is_alive for p in room.players}
+    await notifier.notify(
+        bot, real_player_ids(room), msg, room=code,
+        reply_markup=lambda user_id: game_dashboard(code, phase="discussion", is_alive=alive[user_id], is_admin=(user_id == room.creator_id))
+    )
+
     await callback.message.answer("🗣 Обговорення розпочато!")
 
-@router.callback_query(F.data.startswith("my_status_"))
-async def my_status(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[2]
-    room = await get_room_with_players(session, code)
+@on_callback("my_status")
+async def my_status(callback: types.CallbackQuery, session: AsyncSession, code: str):
+    room = await get_room_view(session, code)
     
     if not room:
         await callback.answer("Кімнату не знайдено.", show_alert=True)
@@ -286,21 +263,20 @@ async def my_status(callback: types.CallbackQuery, session: AsyncSession):
         await callback.answer("Ви не у грі.", show_alert=True)
         return
         
-    card_text = format_player_card(player, show_hidden=True)
+    card_text = render_cache.card(player, show_hidden=True)
     is_admin = (room.creator_id == callback.from_user.id)
     
-    with suppress(TelegramBadRequest):
-        await callback.message.edit_text(
-            f"👤 *Ваші характеристики:*\n\n{card_text}", 
-            reply_markup=game_dashboard(code, phase=room.phase, is_alive=player.is_alive, is_admin=is_admin),
-            parse_mode="Markdown"
-        )
+    await edit_tracker.edit(
+        callback.message,
+        f"👤 *Ваші характеристики:*\n\n{card_text}", 
+        reply_markup=game_dashboard(code, phase=room.phase, is_alive=player.is_alive, is_admin=is_admin),
+        parse_mode="Markdown"
+    )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("view_scenario_"))
-async def view_scenario(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[2]
-    room = await get_room_with_players(session, code)
+@on_callback("view_scenario")
+async def view_scenario(callback: types.CallbackQuery, session: AsyncSession, code: str):
+    room = await get_room_view(session, code)
     
     if not room:
         await callback.answer("Кімнату не знайдено.", show_alert=True)
@@ -316,14 +292,12 @@ async def view_scenario(callback: types.CallbackQuery, session: AsyncSession):
         f"🎯 *Ціль:* Вижити має {room.survivors_count} людей.\n"
         f"🔢 *Раунд:* {room.round_number}"
     )
-    with suppress(TelegramBadRequest):
-        await callback.message.edit_text(msg, reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin), parse_mode="Markdown")
+    await edit_tracker.edit(callback.message, msg, reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("back_to_game_"))
-async def back_to_game(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[3]
-    room = await get_room_with_players(session, code)
+@on_callback("back_to_game")
+async def back_to_game(callback: types.CallbackQuery, session: AsyncSession, code: str):
+    room = await get_room_view(session, code)
     
     if not room:
         await callback.answer("Кімнату не знайдено.", show_alert=True)
@@ -333,16 +307,14 @@ async def back_to_game(callback: types.CallbackQuery, session: AsyncSession):
     is_alive = player.is_alive if player else False
     is_admin = (room.creator_id == callback.from_user.id)
 
-    with suppress(TelegramBadRequest):
-        await callback.message.edit_text("🎮 Панель гравця:", reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin))
+    await edit_tracker.edit(callback.message, "🎮 Панель гравця:", reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin))
     await callback.answer()
 
 # --- View Table ---
 
-@router.callback_query(F.data.startswith("view_table_"))
-async def view_table(callback: types.CallbackQuery, session: AsyncSession, bot: Bot):
-    code = callback.data.split("_")[2]
-    room = await get_room_with_players(session, code)
+@on_callback("view_table")
+async def view_table(callback: types.CallbackQuery, session: AsyncSession, bot: Bot, code: str):
+    room = await get_room_view(session, code)
     
     if not room:
         await callback.answer("Кімнату не знайдено.", show_alert=True)
@@ -352,67 +324,47 @@ async def view_table(callback: types.CallbackQuery, session: AsyncSession, bot:
     is_alive = player.is_alive if player else False
     is_admin = (room.creator_id == callback.from_user.id)
 
-    report = (
-        f"📋 *СТІЛ ГРАВЦІВ* | Раунд {room.round_number}\n"
-        f"➖➖➖➖➖➖➖➖➖➖\n\n"
-    )
-    
-    for p in room.players:
-        report += format_player_card(p, show_hidden=False) + "\n"
-        
-    with suppress(TelegramBadRequest):
-        # Use send_long_message logic but for edit_text it's harder.
-        # If report is too long, we can't edit_text easily into multiple messages.
-        # We should probably send a new message if it's too long, or just truncate.
-        # For now, let's try to send as new message if too long? No, that breaks flow.
-        # Let's just hope table isn't > 4096 chars. 
-        # If it is, we can split it.
-        if len(report) > 4096:
-             # Fallback: send as new messages
-             await send_long_message(bot, callback.from_user.id, report, parse_mode="Markdown")
-             # And update the original message to say "Table sent below"
-             await callback.message.edit_text("📋 Стіл гравців надіслано окремим повідомленням 👇", reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin))
-        else:
-             await callback.message.edit_text(report, reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin), parse_mode="Markdown")
+    report = render_cache.table(room)
+    # Use send_long_message logic but for edit_text it's harder.
+    # If report is too long, we can't edit_text easily into multiple messages.
+    # We should probably send a new message if it's too long, or just truncate.
+    # For now, let's try to send as new message if too long? No, that breaks flow.
+    # Let's just hope table isn't > 4096 chars. 
+    # If it is, we can split it.
+    if len(report) > 4096:
+         # Fallback: send as new messages
+         await send_long_message(bot, callback.from_user.id, report, parse_mode="Markdown")
+         # And update the original message to say "Table sent below"
+         await edit_tracker.edit(callback.message, "📋 Стіл гравців надіслано окремим повідомленням 👇", reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin))
+    else:
+         await edit_tracker.edit(callback.message, report, reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin), parse_mode="Markdown")
     await callback.answer()
 
 # --- Action Cards Handlers ---
 
-@router.callback_query(F.data.startswith("action_cards_"))
-async def show_action_cards(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[2]
-    room = await get_room_with_players(session, code)
+@on_callback("action_cards")
+async def show_action_cards(callback: types.CallbackQuery, session: AsyncSession, code: str):
+    room = await get_room_view(session, code)
     if not room: return
     
     player = next((p for p in room.players if p.user_id == callback.from_user.id), None)
     if not player or not player.is_alive: return
     
-    cards = json.loads(player.action_cards)
-    await callback.message.edit_text("⚡ Ваші картки дій:", reply_markup=action_cards_menu(code, cards))
+    await callback.message.edit_text("⚡ Ваші картки дій:", reply_markup=action_cards_menu(code, player.action_cards))
 
-@router.callback_query(F.data.startswith("info_card_"))
-async def show_card_info(callback: types.CallbackQuery, session: AsyncSession):
-    parts = callback.data.split("_")
-    idx = int(parts[2])
-    code = parts[3]
-    
-    room = await get_room_with_players(session, code)
+@on_callback("info_card")
+async def show_card_info(callback: types.CallbackQuery, session: AsyncSession, index: int, code: str):
+    room = await get_room_view(session, code)
     player = next((p for p in room.players if p.user_id == callback.from_user.id), None)
-    cards = json.loads(player.action_cards)
-    card = cards[idx]
+    card = player.action_cards[index]
     
     await callback.answer(f"{card['name']}\n\n{card['desc']}", show_alert=True)
 
-@router.callback_query(F.data.startswith("use_card_"))
-async def use_card_start(callback: types.CallbackQuery, session: AsyncSession):
-    parts = callback.data.split("_")
-    idx = int(parts[2])
-    code = parts[3]
-    
-    room = await get_room_with_players(session, code)
+@on_callback("use_card")
+async def use_card_start(callback: types.CallbackQuery, session: AsyncSession, index: int, code: str):
+    room = await get_room_view(session, code)
     player = next((p for p in room.players if p.user_id == callback.from_user.id), None)
-    cards = json.loads(player.action_cards)
-    card = cards[idx]
+    card = player.action_cards[index]
     
     if card["used"]:
         await callback.answer("Ця картка вже використана!", show_alert=True)
@@ -420,32 +372,27 @@ async def use_card_start(callback: types.CallbackQuery, session: AsyncSession):
         
     if card.get("needs_target"):
         targets = [p for p in room.players if p.is_alive and p.id != player.id]
-        await callback.message.edit_text(f"🎯 Оберіть ціль для '{card['name']}':", reply_markup=target_selection_menu(code, targets, idx))
+        await callback.message.edit_text(f"🎯 Оберіть ціль для '{card['name']}':", reply_markup=target_selection_menu(code, targets, index, version=room.version))
     else:
-        # Execute immediately
-        await execute_card_effect(callback, session, room, player, idx, None)
+        # Execute immediately (needs the live ORM objects, not the cached view)
+        room = await get_room_with_players(session, code)
+        player = next((p for p in room.players if p.user_id == callback.from_user.id), None)
+        await execute_card_effect(callback, session, room, player, index, None)
 
-@router.callback_query(F.data.startswith("target_"))
-async def use_card_target(callback: types.CallbackQuery, session: AsyncSession):
-    parts = callback.data.split("_")
-    target_id = int(parts[1])
-    idx = int(parts[2])
-    code = parts[3]
-    
+@on_callback("target")
+async def use_card_target(callback: types.CallbackQuery, session: AsyncSession, target_id: int, index: int, code: str):
     room = await get_room_with_players(session, code)
     player = next((p for p in room.players if p.user_id == callback.from_user.id), None)
     target = next((p for p in room.players if p.id == target_id), None)
     
-    await execute_card_effect(callback, session, room, player, idx, target)
+    await execute_card_effect(callback, session, room, player, index, target)
 
 async def execute_card_effect(callback, session, room, player, card_idx, target):
-    cards = json.loads(player.action_cards)
-    card = cards[card_idx]
+    card = player.action_cards[card_idx]
     card_id = card["id"]
     
     # Mark as used
-    card["used"] = True
-    player.action_cards = json.dumps(cards)
+    player.action_cards = use_card(player.action_cards, card_idx)
     
     msg = f"⚡ Гравець *{escape_markdown(player.user.full_name)}* використав картку *{card['name']}*!"
     
@@ -462,8 +409,7 @@ async def execute_card_effect(callback, session, room, player, card_idx, target)
         
     elif card_id == "scan":
         # Private info
-        traits = ["profession", "health", "hobby", "phobia", "inventory", "fact", "bio", "age"]
-        trait_key = random.choice(traits)
+        trait_key = random.choice(TRAIT_KEYS)
         val = getattr(target, trait_key)
         await callback.answer(f"🔍 {target.user.full_name}: {trait_key} = {val}", show_alert=True)
         msg += f"\nВін дізнався щось про *{escape_markdown(target.user.full_name)}*..."
@@ -493,34 +439,30 @@ async def execute_card_effect(callback, session, room, player, card_idx, target)
 
     elif card_id == "mask":
         # Hide one random revealed trait
-        revealed = player.revealed_traits.split(",") if player.revealed_traits else []
+        revealed = [t for t in TRAIT_KEYS if t in revealed_traits(player.revealed_mask)]
         if revealed:
-            hidden = revealed.pop(random.randint(0, len(revealed) - 1))
-            player.revealed_traits = ",".join(revealed)
+            player.revealed_mask = hide_trait(player.revealed_mask, random.choice(revealed))
             msg += f"\n🎭 Він знову приховав свою характеристику!"
         else:
             msg += "\n...але у нього і так нічого не відкрито."
 
     elif card_id == "vote_x2":
-        # Logic needs to be handled in voting phase, for now just narrative
-        msg += "\n📢 Його голос у наступному раунді буде подвоєно!"
+        # Counted by the votes ledger, reset with the round
+        player.vote_weight = 2
+        msg += "\n📢 Його голос у наступному голосуванні буде подвоєно!"
         
     await session.commit()
+    room_cache.put(room)
     
     # Notify everyone
-    for p in room.players:
-        if p.user_id > 0:
-            try:
-                await callback.bot.send_message(p.user_id, msg, parse_mode="Markdown")
-            except: pass
-            
+    await notifier.notify(callback.bot, real_player_ids(room), msg, room=room.code)
+
     # Return to menu
-    await callback.message.edit_text("⚡ Ваші картки дій:", reply_markup=action_cards_menu(room.code, cards))
+    await callback.message.edit_text("⚡ Ваші картки дій:", reply_markup=action_cards_menu(room.code, player.action_cards))
 
-@router.callback_query(F.data.startswith("refresh_game_"))
-async def refresh_game(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[2]
-    room = await get_room_with_players(session, code)
+@on_callback("refresh_game")
+async def refresh_game(callback: types.CallbackQuery, session: AsyncSession, code: str):
+    room = await get_room_view(session, code)
     
     if not room:
         await callback.answer("Кімнату не знайдено.", show_alert=True)
@@ -530,15 +472,13 @@ async def refresh_game(callback: types.CallbackQuery, session: AsyncSession):
     is_alive = player.is_alive if player else False
     is_admin = (room.creator_id == callback.from_user.id)
 
-    with suppress(TelegramBadRequest):
-        await callback.message.edit_text("🎮 Панель гравця:", reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin))
+    await edit_tracker.edit(callback.message, "🎮 Панель гравця:", reply_markup=game_dashboard(code, phase=room.phase, is_alive=is_alive, is_admin=is_admin))
     await callback.answer()
 
 # --- Voting Logic ---
 
-@router.callback_query(F.data.startswith("force_vote_"))
-async def start_voting_phase(callback: types.CallbackQuery, session: AsyncSession, bot: Bot):
-    code = callback.data.split("_")[2]
+@on_callback("force_vote")
+async def start_voting_phase(callback: types.CallbackQuery, session: AsyncSession, bot: Bot, code: str):
     room = await get_room_with_players(session, code)
     
     if room.creator_id != callback.from_user.id:
@@ -547,62 +487,68 @@ async def start_voting_phase(callback: types.CallbackQuery, session: AsyncSessio
 
     room.phase = "voting"
     # Reset votes
-    for p in room.players:
-        p.has_voted = False
-        p.votes_received = 0
+    await update_players(session, room, has_voted=False)
     
     await session.commit()
+    view = room_cache.put(room)
     
     # Notify
-    for p in room.players:
-        if p.user_id > 0 and p.is_alive:
-            try:
-                await bot.send_message(
-                    p.user_id, 
-                    "🗳 *Час голосування!* Оберіть, кого вигнати з бункера.", 
-                    reply_markup=voting_menu(code, room.players),
-                    parse_mode="Markdown"
-                )
-            except: pass
-            
+    await notifier.notify(
+        bot, real_player_ids(room, alive_only=True),
+        "🗳 *Час голосування!* Оберіть, кого вигнати з бункера.",
+        room=code, priority=True,
+        reply_markup=voting_menu(code, view.players, version=view.version)
+    )
+
     await callback.message.answer("🗳 Голосування розпочато!")
 
-@router.callback_query(F.data.startswith("vote_"))
-async def process_vote(callback: types.CallbackQuery, session: AsyncSession, bot: Bot):
-    # vote_{target_id}_{code}
-    parts = callback.data.split("_")
-    target_id = int(parts[1])
-    code = parts[2]
-    
+@on_callback("vote")
+async def process_vote(callback: types.CallbackQuery, session: AsyncSession, bot: Bot, target_id: int, code: str):
     room = await get_room_with_players(session, code)
     voter = next((p for p in room.players if p.user_id == callback.from_user.id), None)
     
-    if not voter or not voter.is_alive or voter.has_voted:
+    if not voter or not voter.is_alive or voter.has_voted or room.phase != "voting":
         await callback.answer("Ви не можете голосувати.", show_alert=True)
         return
 
     # Register vote
-    target = next((p for p in room.players if p.id == target_id), None)
+    target = next((p for p in room.players if p.id == target_id and p.is_alive), None)
     if target:
-        target.votes_received += 1
+        # The unique (room, round, voter) key turns a repeated or concurrent vote into a no-op
+        if not await cast_vote(session, room, voter, target):
+            await callback.answer("Ви вже проголосували.", show_alert=True)
+            return
         voter.has_voted = True
         
         await session.commit()
+        room_cache.put(room)
         safe_target_name = escape_markdown(target.user.full_name or target.user.username)
         await callback.message.edit_text(f"✅ Ви проголосували проти {safe_target_name}.")
     
-    # Check if all REAL players voted
-    alive_real_players = [p for p in room.players if p.is_alive and p.user_id > 0]
-    if all(p.has_voted for p in alive_real_players):
+    # Check if all REAL players voted (read from the ledger, so concurrent last votes can't miss each other)
+    alive_real_players = {p.id for p in room.players if p.is_alive and p.user_id > 0}
+    if alive_real_players <= await voter_ids(session, room):
         await callback.message.answer("🤖 Боти думають...")
         await finish_voting(room, session, bot)
 
 async def finish_voting(room, session, bot):
+    # Claim the round: only one finish_voting may run for it, even across workers.
+    # The row stays locked until the final commit, which moves the phase on
+    claimed = await session.execute(
+        update(Room)
+        .where(Room.id == room.id, Room.phase == "voting", Room.round_number == room.round_number)
+        .values(phase="counting"),
+        execution_options={"synchronize_session": "evaluate"},
+    )
+    if claimed.rowcount == 0:
+        return
+
     # Bots vote smartly (Batch)
     alive_bots = [p for p in room.players if p.is_alive and p.user_id < 0 and not p.has_voted]
     alive_targets = [p for p in room.players if p.is_alive]
     
     bot_reasons = []
+    bot_votes = []
 
     if alive_bots:
         # Get all decisions in one call
@@ -613,7 +559,6 @@ async def finish_voting(room, session, bot):
             
             # Fallback if batch failed for specific bot
             if not decision:
-                 import random
                  valid_targets = [p for p in alive_targets if p.id != bot_player.id]
                  if valid_targets:
                      target = random.choice(valid_targets)
@@ -628,8 +573,7 @@ async def finish_voting(room, session, bot):
             target = next((p for p in alive_targets if p.id == target_id), None)
             
             if target:
-                target.votes_received += 1
-                bot_player.has_voted = True
+                bot_votes.append((bot_player, target))
                 
                 bot_name = bot_player.user.full_name or "Bot"
                 target_name = target.user.full_name or "Unknown"
@@ -637,65 +581,59 @@ async def finish_voting(room, session, bot):
 
     if bot_reasons:
         msg_reasons = "🗳️ **Рішення ботів:**\n\n" + "\n".join(bot_reasons)
-        for p in room.players:
-            if p.user_id > 0:
-                try:
-                    await bot.send_message(p.user_id, msg_reasons, parse_mode="Markdown")
-                except Exception as e:
-                    logger.error(f"Failed to send bot reasons to {p.user_id}: {e}")
-
-    await session.commit()
+        await notifier.notify(bot, real_player_ids(room), msg_reasons, room=room.code)
     
     # Calculate loser
-    loser = max(alive_targets, key=lambda p: p.votes_received)
-    # Handle ties? For now, just pick one.
+    await cast_votes(session, room, bot_votes)
+    loser, tie = pick_loser(alive_targets, await tally(session, room))
     
     # Check Passive Cards
-    loser_cards = json.loads(loser.action_cards)
     saved = False
     revenge_target = None
     
-    for card in loser_cards:
+    for i, card in enumerate(loser.action_cards):
         if not card["used"]:
             if card["id"] == "defense":
                 saved = True
-                card["used"] = True
-                loser.action_cards = json.dumps(loser_cards)
+                loser.action_cards = use_card(loser.action_cards, i)
                 break
             elif card["id"] == "revenge":
-                card["used"] = True
-                loser.action_cards = json.dumps(loser_cards)
+                loser.action_cards = use_card(loser.action_cards, i)
                 # Pick random victim
                 potential_victims = [p for p in alive_targets if p.id != loser.id]
                 if potential_victims:
                     revenge_target = random.choice(potential_victims)
                 break
     
-    msg_extra = ""
+    msg_extra = "\n⚖️ Нічия! Долю вирішив жереб." if tie else ""
     
     if saved:
-        msg_extra = f"\n🛡️ Але *{escape_markdown(loser.user.full_name)}* використав Бронежилет і залишився в грі!"
+        msg_extra += f"\n🛡️ Але *{escape_markdown(loser.user.full_name)}* використав Бронежилет і залишився в грі!"
     else:
         loser.is_alive = False
         # Reveal all traits for loser
-        all_traits = ["profession", "health", "hobby", "phobia", "inventory", "fact", "bio", "age"]
-        loser.revealed_traits = ",".join(all_traits)
+        loser.revealed_mask = ALL_TRAITS_MASK
         
         if revenge_target:
             revenge_target.is_alive = False
-            revenge_target.revealed_traits = ",".join(all_traits)
-            msg_extra = f"\n💣 *{escape_markdown(loser.user.full_name)}* використав Помсту і забрав з собою *{escape_markdown(revenge_target.user.full_name)}*!"
+            revenge_target.revealed_mask = ALL_TRAITS_MASK
+            msg_extra += f"\n💣 *{escape_markdown(loser.user.full_name)}* використав Помсту і забрав з собою *{escape_markdown(revenge_target.user.full_name)}*!"
 
     room.round_number += 1
     room.phase = "revealing"
     
+    # Check Game Over (finished in the same transaction as the round change)
+    alive_count = len([p for p in room.players if p.is_alive])
+    game_over = alive_count <= room.survivors_count
+    if game_over:
+        room.is_finished = True
+        room.phase = "finished"
+    
     # Reset round state
-    for p in room.players:
-        p.revealed_count_round = 0
-        p.has_voted = False
-        p.votes_received = 0
+    await update_players(session, room, revealed_count_round=0, has_voted=False, vote_weight=1)
         
     await session.commit()
+    room_cache.put(room)
     
     # Notify result
     safe_loser_name = escape_markdown(loser.user.full_name or loser.user.username)
@@ -716,91 +654,79 @@ async def finish_voting(room, session, bot):
             f"Відкрийте 1 характеристику!"
         )
     
-    # Check Game Over
-    alive_count = len([p for p in room.players if p.is_alive])
-    if alive_count <= room.survivors_count:
+    if game_over:
         await end_game(room, session, bot)
         return
 
-    for p in room.players:
-        if p.user_id > 0:
-            try:
-                is_admin = (p.user_id == room.creator_id)
-                await bot.send_message(p.user_id, msg, parse_mode="Markdown", reply_markup=game_dashboard(room.code, phase="revealing", is_alive=p.is_alive, is_admin=is_admin))
-            except: pass
+    alive = {p.user_id: p.is_alive for p in room.players}
+    await notifier.notify(
+        bot, real_player_ids(room), msg, room=room.code,
+        reply_markup=lambda user_id: game_dashboard(room.code, phase="revealing", is_alive=alive[user_id], is_admin=(user_id == room.creator_id))
+    )
 
 async def end_game(room, session, bot):
     room.is_finished = True
     room.phase = "finished"
     await session.commit()
+    view = room_cache.put(room)
+    active_rooms.remove_room(room.code)
     
-    survivors = [p for p in room.players if p.is_alive]
-    survivors_desc = "\n".join([format_player_card(p, show_hidden=True) for p in survivors])
-    
-    try:
-        await bot.send_message(room.creator_id, "🏁 Гра завершена! Генерую кінцівку...")
-    except Exception as e:
-        logger.error(f"Failed to send status message: {e}")
+    survivors = [p for p in view.players if p.is_alive]
+    survivors_desc = "\n".join([render_cache.card(p, show_hidden=True) for p in survivors])
     
     # Load Pack Data for Ending Prompt
-    ending_prompt = None
-    if room.pack_id:
-        from ..database.models import GamePack
-        import json
-        pack_res = await session.execute(select(GamePack).where(GamePack.id == room.pack_id))
-        pack = pack_res.scalar_one_or_none()
-        if pack:
-            try:
-                full_pack = json.loads(pack.data)
-                ending_prompt = full_pack.get("ai_prompts", {}).get("ending_prompt")
-            except:
-                pass
-
-    ending = None
+    pack = await pack_cache.get(session, room.pack_id) if room.pack_id else None
+    ending_prompt = pack.ending_prompt if pack else None
+
+    # Game over: whatever is still pending goes out before the ending
+    await notifier.flush(real_player_ids(room))
+
+    # Stream the ending into a message that is edited as the text arrives
+    live = LiveMessage(
+        bot, real_player_ids(room),
+        header="📜 *Історія виживання:*\n",
+        placeholder="⏳ Генерую кінцівку...",
+        # Convert AI double asterisks to single for legacy Markdown
+        render=lambda text: text.replace("**", "*"),
+        plain_render=lambda text: text.replace("*", ""),
+    )
+    await live.start()
+
+    replacement = None
     try:
-        # Add timeout to prevent hanging (30 seconds max)
-        ending = await asyncio.wait_for(ai_service.generate_ending(survivors_desc, room.scenario, custom_prompt=ending_prompt), timeout=30.0)
+        # The AI service enforces its own deadline (AI_ENDING_TIMEOUT)
+        async for chunk in ai_service.generate_ending_stream(survivors_desc, room.scenario, custom_prompt=ending_prompt):
+            await live.append(chunk)
+        if not live.text and not live.parts:
+            replacement = "Історія завершилася мовчанням..."
     except asyncio.TimeoutError:
-        logger.error(f"AI ending generation timed out after 30 seconds")
-        ending = "Час кінчився, а кінцівка ще генерується. Вибачте, дещо пішло не так."
+        logger.error(f"AI ending generation timed out")
+        if not live.text and not live.parts:
+            replacement = "Час кінчився, а кінцівка ще генерується. Вибачте, дещо пішло не так."
     except Exception as e:
         logger.error(f"AI ending generation failed: {e}")
-        ending = "Всі вижили... або ні. AI втомився."
-        
-    for p in room.players:
-        if p.user_id > 0:
-            try:
-                # Send ending separately
-                safe_ending = ending.replace("**", "*")
-                await send_long_message(bot, p.user_id, f"📜 *Історія виживання:*\n{safe_ending}", parse_mode="Markdown")
-                
-                final_msg = (
-                    f"🏁 *ГРА ЗАВЕРШЕНА!* 🏁\n\n"
-                    f"Дякую за гру!"
-                )
-                await bot.send_message(p.user_id, final_msg, parse_mode="Markdown", reply_markup=main_menu())
-            except Exception as e:
-                logger.error(f"Failed to send final message to {p.user_id}: {e}")
+        if not live.text and not live.parts:
+            replacement = "Всі вижили... або ні. AI втомився."
+    await live.finish(replacement)
+
+    final_msg = (
+        f"🏁 *ГРА ЗАВЕРШЕНА!* 🏁\n\n"
+        f"Дякую за гру!"
+    )
+    await notifier.notify(bot, real_player_ids(room), final_msg, room=room.code, priority=True, reply_markup=main_menu())
 
 @router.message(F.text & ~F.text.startswith("/"))
 async def game_chat(message: types.Message, session: AsyncSession, bot: Bot):
     """Handles in-game chat messages."""
     # Find active room for user
-    stmt = (
-        select(Room)
-        .join(Player)
-        .options(selectinload(Room.players).selectinload(Player.user))
-        .where(
-            Player.user_id == message.from_user.id,
-            Room.is_active == True,
-            Room.is_finished == False
-        )
-        .order_by(Room.id.desc())
-    )
-    result = await session.execute(stmt)
-    room = result.scalars().first()
-
-    if not room:
+    code = await active_rooms.lookup(session, message.from_user.id)
+    room = code and await get_room_view(session, code)
+    if code and not (room and room.is_active and not room.is_finished):
+        # Ended by another worker: forget it, the player may already be in a newer game
+        active_rooms.remove_room(code)
+        code = await active_rooms.lookup(session, message.from_user.id)
+        room = code and await get_room_view(session, code)
+    if not room or not room.is_active or room.is_finished:
         return
 
     sender = next((p for p in room.players if p.user_id == message.from_user.id), None)
@@ -816,9 +742,7 @@ async def game_chat(message: types.Message, session: AsyncSession, bot: Bot):
     
     chat_msg = f"💬 *{safe_sender_name}*: {safe_text}"
 
-    for p in room.players:
-        if p.user_id > 0 and p.user_id != message.from_user.id: # Send to others
-            try:
-                await bot.send_message(p.user_id, chat_msg, parse_mode="Markdown")
-            except Exception as e:
-                logger.error(f"Failed to send chat message to {p.user_id}: {e}")
+    # Send to others
+    recipients = [user_id for user_id in real_player_ids(room) if user_id != message.from_user.id]
+    # Sent right away, together with any notifications still waiting for these players
+    await notifier.notify(bot, recipients, chat_msg, room=code, priority=True)
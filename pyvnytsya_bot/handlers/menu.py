@@ -2,17 +2,23 @@ from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 import random
 
 from ..database.models import Room, Player, User
 from ..utils.codes import generate_room_code
 from ..utils.game_utils import get_random_bot_name
+from .callbacks import on_callback
 from ..keyboards.inline import room_creator_menu, room_player_menu, back_to_main
 from ..states.game_states import JoinRoom
+from ..services.room_cache import room_cache
+from ..services.active_rooms import active_rooms
+from ..services.pack_cache import pack_cache
+from ..services.scenario_pool import scenario_pool
 
 router = Router()
 
-@router.callback_query(F.data == "create_room")
+@on_callback("create_room")
 async def create_room(callback: types.CallbackQuery, session: AsyncSession):
     # Generate unique code
     code = generate_room_code()
@@ -35,10 +41,8 @@ async def create_room(callback: types.CallbackQuery, session: AsyncSession):
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("add_bot_"))
-async def add_bot(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[2]
-    
+@on_callback("add_bot")
+async def add_bot(callback: types.CallbackQuery, session: AsyncSession, code: str):
     result = await session.execute(select(Room).where(Room.code == code))
     room = result.scalar_one_or_none()
     
@@ -62,6 +66,7 @@ async def add_bot(callback: types.CallbackQuery, session: AsyncSession):
     session.add(player)
     
     await session.commit()
+    room_cache.invalidate(code)
     
     # Count players
     players_res = await session.execute(select(Player).where(Player.room_id == room.id))
@@ -75,9 +80,8 @@ async def add_bot(callback: types.CallbackQuery, session: AsyncSession):
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("delete_room_"))
-async def delete_room(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[2]
+@on_callback("delete_room")
+async def delete_room(callback: types.CallbackQuery, session: AsyncSession, code: str):
     result = await session.execute(select(Room).where(Room.code == code))
     room = result.scalar_one_or_none()
     
@@ -87,11 +91,12 @@ async def delete_room(callback: types.CallbackQuery, session: AsyncSession):
 
     await session.delete(room)
     await session.commit()
+    room_cache.invalidate(code)
+    active_rooms.remove_room(code)
     await callback.message.edit_text("🗑️ Кімната видалена.", reply_markup=back_to_main())
 
-@router.callback_query(F.data.startswith("settings_"))
-async def room_settings(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[1]
+@on_callback("settings")
+async def room_settings(callback: types.CallbackQuery, session: AsyncSession, code: str):
     result = await session.execute(select(Room).where(Room.code == code))
     room = result.scalar_one_or_none()
     
@@ -102,9 +107,8 @@ async def room_settings(callback: types.CallbackQuery, session: AsyncSession):
     from ..keyboards.inline import settings_menu
     await callback.message.edit_text(f"⚙️ Налаштування кімнати `{code}`", reply_markup=settings_menu(code), parse_mode="Markdown")
 
-@router.callback_query(F.data.startswith("back_to_room_"))
-async def back_to_room(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[3]
+@on_callback("back_to_room")
+async def back_to_room(callback: types.CallbackQuery, session: AsyncSession, code: str):
     await callback.message.edit_text(
         f"✅ Кімната створена!\n\n🔑 Код кімнати: `{code}`\n"
         "Поділіться цим кодом з друзями. Коли всі приєднаються, натисніть 'Почати гру'.",
@@ -112,10 +116,8 @@ async def back_to_room(callback: types.CallbackQuery, session: AsyncSession):
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("choose_pack_"))
-async def choose_pack(callback: types.CallbackQuery, session: AsyncSession):
-    code = callback.data.split("_")[2]
-    
+@on_callback("choose_pack")
+async def choose_pack(callback: types.CallbackQuery, session: AsyncSession, code: str):
     # Get user's packs + public packs
     from ..database.models import GamePack
     stmt = select(GamePack).where((GamePack.user_id == callback.from_user.id) | (GamePack.is_public == True))
@@ -125,36 +127,31 @@ async def choose_pack(callback: types.CallbackQuery, session: AsyncSession):
     from ..keyboards.inline import packs_menu
     await callback.message.edit_text("📂 Оберіть пак для гри:", reply_markup=packs_menu(code, packs, callback.from_user.id))
 
-@router.callback_query(F.data.startswith("set_pack_"))
-async def set_pack(callback: types.CallbackQuery, session: AsyncSession):
-    parts = callback.data.split("_")
-    pack_id_str = parts[2]
-    code = parts[3]
-    
+@on_callback("set_pack")
+async def set_pack(callback: types.CallbackQuery, session: AsyncSession, pack_id: int, code: str):
     result = await session.execute(select(Room).where(Room.code == code))
     room = result.scalar_one_or_none()
     
     if not room: return
 
-    if pack_id_str == "default":
+    if not pack_id: # the default pack
         room.pack_id = None
         pack_name = "Стандартний"
     else:
-        room.pack_id = int(pack_id_str)
+        room.pack_id = pack_id
         # Get pack name for confirmation
-        from ..database.models import GamePack
-        pack_res = await session.execute(select(GamePack).where(GamePack.id == int(pack_id_str)))
-        pack = pack_res.scalar_one_or_none()
+        pack = await pack_cache.get(session, room.pack_id)
         pack_name = pack.name if pack else "Невідомий"
+        if pack:
+            # Have scenarios for this pack ready by the time the game starts
+            scenario_pool.warm(pack.scenario_prompt)
 
     await session.commit()
+    room_cache.invalidate(code)
     await callback.answer(f"✅ Обрано пак: {pack_name}", show_alert=True)
 
-@router.callback_query(F.data.startswith("delete_pack_"))
-async def delete_pack(callback: types.CallbackQuery, session: AsyncSession):
-    parts = callback.data.split("_")
-    pack_id = int(parts[2])
-    code = parts[3]
+@on_callback("delete_pack")
+async def delete_pack(callback: types.CallbackQuery, session: AsyncSession, pack_id: int, code: str):
 
     from ..database.models import GamePack
     
@@ -172,6 +169,8 @@ async def delete_pack(callback: types.CallbackQuery, session: AsyncSession):
     
     await session.delete(pack)
     await session.commit()
+    pack_cache.invalidate(pack_id)
+    room_cache.invalidate_where(lambda view: view.pack_id == pack_id)
     
     await callback.answer("🗑️ Пак видалено!", show_alert=True)
     
@@ -183,7 +182,7 @@ async def delete_pack(callback: types.CallbackQuery, session: AsyncSession):
     from ..keyboards.inline import packs_menu
     await callback.message.edit_text("📂 Оберіть пак для гри:", reply_markup=packs_menu(code, packs, callback.from_user.id))
 
-@router.callback_query(F.data.startswith("get_template_"))
+@on_callback("get_template")
 async def get_template(callback: types.CallbackQuery):
     template_json = """{
   "name": "Мій крутий пак",
@@ -224,7 +223,7 @@ async def get_template(callback: types.CallbackQuery):
     await callback.message.answer_document(file, caption="📥 Ось шаблон. Відредагуйте його та надішліть мені файл назад.")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("upload_pack_"))
+@on_callback("upload_pack")
 async def upload_pack_instruction(callback: types.CallbackQuery):
     await callback.message.answer("📤 Надішліть мені `.json` файл з вашим паком. Я додам його у вашу бібліотеку.")
     await callback.answer()
@@ -269,7 +268,7 @@ async def handle_document(message: types.Message, session: AsyncSession, bot: Bo
     except Exception as e:
         await message.reply(f"❌ Сталася помилка: {e}")
 
-@router.callback_query(F.data == "join_room")
+@on_callback("join_room")
 async def join_room_start(callback: types.CallbackQuery, state: FSMContext):
     await callback.message.edit_text(
         "Введіть код кімнати:",
@@ -302,7 +301,15 @@ async def join_room_process(message: types.Message, session: AsyncSession, state
     # Add player
     new_player = Player(user_id=message.from_user.id, room_id=room.id)
     session.add(new_player)
-    await session.commit()
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Joined twice at the same time, uq_players_room_user kept one seat
+        await session.rollback()
+        await message.answer("Ви вже в цій кімнаті!", reply_markup=room_player_menu(code))
+        await state.clear()
+        return
+    room_cache.invalidate(code)
     
     await message.answer(
         f"✅ Ви приєдналися до кімнати `{code}`!\nОчікуйте початку гри.",
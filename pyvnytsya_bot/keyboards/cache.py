@@ -0,0 +1,72 @@
+import functools
+from collections import OrderedDict
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+
+def freeze(markup: InlineKeyboardMarkup) -> tuple:
+    """Immutable snapshot of a markup: rows of buttons, each a tuple of its (field, value) pairs."""
+    return tuple(
+        tuple(tuple(button.model_dump(exclude_none=True).items()) for button in row)
+        for row in markup.inline_keyboard
+    )
+
+
+def thaw(rows: tuple) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(**dict(button)) for button in row] for row in rows])
+
+
+class KeyboardCache:
+    """
+    Bounded LRU of built keyboards. aiogram markups are mutable, so the cache keeps
+    an immutable snapshot and every caller gets a fresh markup made from it (still
+    several times cheaper than InlineKeyboardBuilder). Keys must capture every input
+    the keyboard depends on; for menus built from a room's players that is the
+    room cache version, which changes whenever the room does.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._entries = OrderedDict() # key -> frozen rows
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        rows = self._entries.get(key)
+        if rows is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return thaw(rows)
+        self.misses += 1
+        markup = build()
+        self._entries[key] = freeze(markup)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return markup
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+keyboard_cache = KeyboardCache()
+
+
+def cached_keyboard(key=None):
+    """
+    Memoizes a keyboard builder in `keyboard_cache`. `key` gets the builder's
+    arguments and returns the cache key, or None to build without caching; by
+    default the arguments themselves are the key (they must be hashable).
+    """
+    def decorator(builder):
+        @functools.wraps(builder)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs) if key else (args, tuple(kwargs.items()))
+            if cache_key is None:
+                return builder(*args, **kwargs)
+            return keyboard_cache.get((builder.__name__, cache_key), lambda: builder(*args, **kwargs))
+        wrapper.uncached = builder
+        return wrapper
+    return decorator
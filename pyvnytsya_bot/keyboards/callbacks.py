@@ -0,0 +1,98 @@
+import base64
+import binascii
+import struct
+
+from ..utils.game_utils import TRAIT_KEYS
+
+# Payload fields and how they are packed (little-endian, no padding)
+FIELDS = {
+    "code": "6s",      # room code, ASCII, at most 6 characters
+    "target_id": "I",  # Player.id
+    "pack_id": "I",    # GamePack.id, 0 = the default pack
+    "index": "B",      # action card index
+    "trait": "B",      # index in TRAIT_KEYS
+}
+
+# action -> (opcode, fields). Opcodes are one character and must never be reused
+# for a different action: old keyboards stay on users' screens.
+ACTIONS = {
+    # Main menu
+    "main_menu": ("m", ()),
+    "rules": ("r", ()),
+    "create_room": ("c", ()),
+    "join_room": ("j", ()),
+    # Lobby
+    "add_bot": ("b", ("code",)),
+    "delete_room": ("d", ("code",)),
+    "leave_room": ("l", ("code",)),
+    "settings": ("s", ("code",)),
+    "back_to_room": ("o", ("code",)),
+    "choose_pack": ("p", ("code",)),
+    "set_pack": ("P", ("pack_id", "code")),
+    "delete_pack": ("x", ("pack_id", "code")),
+    "get_template": ("t", ("code",)),
+    "upload_pack": ("u", ("code",)),
+    # Game
+    "start_game": ("g", ("code",)),
+    "reveal_menu": ("M", ("code",)),
+    "reveal": ("e", ("trait", "code")),
+    "start_discuss": ("D", ("code",)),
+    "my_status": ("S", ("code",)),
+    "view_scenario": ("V", ("code",)),
+    "back_to_game": ("B", ("code",)),
+    "view_table": ("T", ("code",)),
+    "refresh_game": ("F", ("code",)),
+    "action_cards": ("A", ("code",)),
+    "info_card": ("i", ("index", "code")),
+    "use_card": ("U", ("index", "code")),
+    "target": ("y", ("target_id", "index", "code")),
+    "force_vote": ("f", ("code",)),
+    "vote": ("v", ("target_id", "code")),
+}
+
+# opcode -> (action, fields, struct)
+OPCODES = {
+    opcode: (action, fields, struct.Struct("<" + "".join(FIELDS[f] for f in fields)))
+    for action, (opcode, fields) in ACTIONS.items()
+}
+assert len(OPCODES) == len(ACTIONS), "duplicate callback opcode"
+
+
+def pack(action: str, **values) -> str:
+    """Callback data for `action`: the opcode followed by the base64url-packed fields."""
+    opcode, fields = ACTIONS[action]
+    if not fields:
+        return opcode
+    args = []
+    for field in fields:
+        value = values[field]
+        if field == "code":
+            value = value.encode("ascii")
+        elif field == "trait":
+            value = TRAIT_KEYS.index(value)
+        args.append(value)
+    packed = OPCODES[opcode][2].pack(*args)
+    return opcode + base64.urlsafe_b64encode(packed).rstrip(b"=").decode("ascii")
+
+
+def unpack(data: str):
+    """(action, {field: value}) from callback data. ValueError if it is not ours (e.g. an old keyboard)."""
+    if not data or data[0] not in OPCODES:
+        raise ValueError(f"Unknown callback data: {data!r}")
+    action, fields, layout = OPCODES[data[0]]
+    if not fields:
+        if len(data) != 1:
+            raise ValueError(f"Unknown callback data: {data!r}")
+        return action, {}
+
+    encoded = data[1:]
+    try:
+        raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+        values = dict(zip(fields, layout.unpack(raw)))
+        if "code" in values:
+            values["code"] = values["code"].rstrip(b"\0").decode("ascii")
+        if "trait" in values:
+            values["trait"] = TRAIT_KEYS[values["trait"]]
+    except (binascii.Error, struct.error, UnicodeDecodeError, IndexError) as e:
+        raise ValueError(f"Malformed callback data: {data!r}") from e
+    return action, values
@@ -1,37 +1,46 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from ..utils.game_utils import revealed_traits
+from .callbacks import pack
+from .cache import cached_keyboard
+
+@cached_keyboard()
 def main_menu() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="🏠 Створити кімнату", callback_data="create_room")
-    builder.button(text="🔑 Приєднатися", callback_data="join_room")
-    builder.button(text="📜 Правила", callback_data="rules")
+    builder.button(text="🏠 Створити кімнату", callback_data=pack("create_room"))
+    builder.button(text="🔑 Приєднатися", callback_data=pack("join_room"))
+    builder.button(text="📜 Правила", callback_data=pack("rules"))
     builder.adjust(1)
     return builder.as_markup()
 
+@cached_keyboard()
 def room_creator_menu(room_code: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="🚀 Почати гру", callback_data=f"start_game_{room_code}")
-    builder.button(text="⚙️ Налаштування", callback_data=f"settings_{room_code}")
-    builder.button(text="🤖 Додати бота", callback_data=f"add_bot_{room_code}")
-    builder.button(text="❌ Видалити кімнату", callback_data=f"delete_room_{room_code}")
+    builder.button(text="🚀 Почати гру", callback_data=pack("start_game", code=room_code))
+    builder.button(text="⚙️ Налаштування", callback_data=pack("settings", code=room_code))
+    builder.button(text="🤖 Додати бота", callback_data=pack("add_bot", code=room_code))
+    builder.button(text="❌ Видалити кімнату", callback_data=pack("delete_room", code=room_code))
     builder.adjust(1, 2, 1)
     return builder.as_markup()
 
+@cached_keyboard()
 def room_player_menu(room_code: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="👤 Мій статус", callback_data=f"my_status_{room_code}")
-    builder.button(text="🚪 Вийти", callback_data=f"leave_room_{room_code}")
+    builder.button(text="👤 Мій статус", callback_data=pack("my_status", code=room_code))
+    builder.button(text="🚪 Вийти", callback_data=pack("leave_room", code=room_code))
     builder.adjust(2)
     return builder.as_markup()
 
+@cached_keyboard()
 def back_to_main() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="🔙 На головну", callback_data="main_menu")
+    builder.button(text="🔙 На головну", callback_data=pack("main_menu"))
     return builder.as_markup()
 
 # --- Game Keyboards ---
 
+@cached_keyboard()
 def game_dashboard(room_code: str, phase: str = "revealing", is_alive: bool = True, is_admin: bool = False) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
@@ -41,40 +50,42 @@ def game_dashboard(room_code: str, phase: str = "revealing", is_alive: bool = Tr
     row1 = 0
     if is_alive:
         if phase == "revealing":
-            builder.button(text="🃏 Відкрити карту", callback_data=f"reveal_menu_{room_code}")
+            builder.button(text="🃏 Відкрити карту", callback_data=pack("reveal_menu", code=room_code))
             row1 += 1
-        builder.button(text="👤 Мої характеристики", callback_data=f"my_status_{room_code}")
+        builder.button(text="👤 Мої характеристики", callback_data=pack("my_status", code=room_code))
         row1 += 1
     if row1 > 0: sizes.append(row1)
     
     # Row 1.5: Action Cards
     if is_alive:
-        builder.button(text="⚡ Картки дій", callback_data=f"action_cards_{room_code}")
+        builder.button(text="⚡ Картки дій", callback_data=pack("action_cards", code=room_code))
         sizes.append(1)
     
     # Row 2: Info
-    builder.button(text="👀 Стіл гравців", callback_data=f"view_table_{room_code}")
-    builder.button(text="📜 Інфо про бункер", callback_data=f"view_scenario_{room_code}")
+    builder.button(text="👀 Стіл гравців", callback_data=pack("view_table", code=room_code))
+    builder.button(text="📜 Інфо про бункер", callback_data=pack("view_scenario", code=room_code))
     sizes.append(2)
     
     # Row 3: Admin
     if is_admin:
         if phase == "revealing":
-            builder.button(text="🗣 Почати обговорення", callback_data=f"start_discuss_{room_code}")
+            builder.button(text="🗣 Почати обговорення", callback_data=pack("start_discuss", code=room_code))
             sizes.append(1)
         elif phase == "discussion":
-            builder.button(text="📢 Почати голосування", callback_data=f"force_vote_{room_code}")
+            builder.button(text="📢 Почати голосування", callback_data=pack("force_vote", code=room_code))
             sizes.append(1)
         
     # Row 4: Refresh
-    builder.button(text="🔄 Оновити", callback_data=f"refresh_game_{room_code}")
+    builder.button(text="🔄 Оновити", callback_data=pack("refresh_game", code=room_code))
     sizes.append(1)
     
     builder.adjust(*sizes)
     return builder.as_markup()
 
-def reveal_menu(room_code: str, revealed_traits: list) -> InlineKeyboardMarkup:
+@cached_keyboard()
+def reveal_menu(room_code: str, revealed_mask: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
+    revealed = revealed_traits(revealed_mask)
     # Ordered for better layout
     traits = {
         "bio": "⚧ Стать",
@@ -88,14 +99,14 @@ def reveal_menu(room_code: str, revealed_traits: list) -> InlineKeyboardMarkup:
     }
     
     for key, label in traits.items():
-        if key not in revealed_traits:
-            builder.button(text=label, callback_data=f"reveal_{key}_{room_code}")
+        if key not in revealed:
+            builder.button(text=label, callback_data=pack("reveal", trait=key, code=room_code))
             
-    builder.button(text="🔙 Назад", callback_data=f"back_to_game_{room_code}")
+    builder.button(text="🔙 Назад", callback_data=pack("back_to_game", code=room_code))
     
     # Adjust 2 columns for traits, 1 for back button
     # We need to calculate how many traits are left to know how to adjust
-    count = len([k for k in traits if k not in revealed_traits])
+    count = len([k for k in traits if k not in revealed])
     
     # If count is even: 2, 2, ..., 1
     # If count is odd: 2, 2, ..., 1, 1 (last trait alone, then back)
@@ -114,41 +125,45 @@ def reveal_menu(room_code: str, revealed_traits: list) -> InlineKeyboardMarkup:
     builder.adjust(*sizes)
     return builder.as_markup()
 
-def voting_menu(room_code: str, players: list) -> InlineKeyboardMarkup:
+# Built from the room's players: cached per room version, rebuilt when no version is given
+@cached_keyboard(lambda room_code, players, version=None: version and (room_code, version))
+def voting_menu(room_code: str, players: list, version: int = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for player in players:
         if player.is_alive:
             name = player.user.full_name or player.user.username
-            builder.button(text=f"💀 {name}", callback_data=f"vote_{player.id}_{room_code}")
+            builder.button(text=f"💀 {name}", callback_data=pack("vote", target_id=player.id, code=room_code))
     builder.adjust(2) # 2 players per row looks better
     return builder.as_markup()
 
+@cached_keyboard()
 def admin_game_menu(room_code: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="📢 Почати голосування", callback_data=f"force_vote_{room_code}")
-    builder.button(text="👀 Стіл гравців", callback_data=f"view_table_{room_code}")
+    builder.button(text="📢 Почати голосування", callback_data=pack("force_vote", code=room_code))
+    builder.button(text="👀 Стіл гравців", callback_data=pack("view_table", code=room_code))
     builder.adjust(1)
     return builder.as_markup()
 
+@cached_keyboard()
 def settings_menu(room_code: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="📂 Обрати Пак (Пресет)", callback_data=f"choose_pack_{room_code}")
-    builder.button(text="🔙 Назад", callback_data=f"back_to_room_{room_code}")
+    builder.button(text="📂 Обрати Пак (Пресет)", callback_data=pack("choose_pack", code=room_code))
+    builder.button(text="🔙 Назад", callback_data=pack("back_to_room", code=room_code))
     builder.adjust(1)
     return builder.as_markup()
 
 def packs_menu(room_code: str, packs: list, user_id: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="📦 Стандартний", callback_data=f"set_pack_default_{room_code}")
+    builder.button(text="📦 Стандартний", callback_data=pack("set_pack", pack_id=0, code=room_code))
     
-    for pack in packs:
-        builder.button(text=f"📦 {pack.name}", callback_data=f"set_pack_{pack.id}_{room_code}")
-        if pack.user_id == user_id:
-             builder.button(text="❌", callback_data=f"delete_pack_{pack.id}_{room_code}")
+    for game_pack in packs:
+        builder.button(text=f"📦 {game_pack.name}", callback_data=pack("set_pack", pack_id=game_pack.id, code=room_code))
+        if game_pack.user_id == user_id:
+             builder.button(text="❌", callback_data=pack("delete_pack", pack_id=game_pack.id, code=room_code))
         
-    builder.button(text="📥 Завантажити шаблон", callback_data=f"get_template_{room_code}")
-    builder.button(text="📤 Завантажити свій пак", callback_data=f"upload_pack_{room_code}")
-    builder.button(text="🔙 Назад", callback_data=f"settings_{room_code}")
+    builder.button(text="📥 Завантажити шаблон", callback_data=pack("get_template", code=room_code))
+    builder.button(text="📤 Завантажити свій пак", callback_data=pack("upload_pack", code=room_code))
+    builder.button(text="🔙 Назад", callback_data=pack("settings", code=room_code))
     
     # Adjust layout: 1 for default, then 2 for custom packs (select + delete) or 1 if public, then 1 for actions
     # This is tricky with dynamic adjust. Let's try to be smart.
@@ -161,8 +176,8 @@ def packs_menu(room_code: str, packs: list, user_id: int) -> InlineKeyboardMarku
     # But builder.adjust() takes a list of integers for row sizes.
     
     sizes = [1] # Standard
-    for pack in packs:
-        if pack.user_id == user_id:
+    for game_pack in packs:
+        if game_pack.user_id == user_id:
             sizes.append(2) # Select + Delete
         else:
             sizes.append(1) # Select only
@@ -172,6 +187,7 @@ def packs_menu(room_code: str, packs: list, user_id: int) -> InlineKeyboardMarku
     builder.adjust(*sizes)
     return builder.as_markup()
 
+@cached_keyboard(lambda room_code, cards: (room_code, tuple((card["name"], card["type"], card["used"]) for card in cards)))
 def action_cards_menu(room_code: str, cards: list) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     sizes = []
@@ -179,25 +195,26 @@ def action_cards_menu(room_code: str, cards: list) -> InlineKeyboardMarkup:
     for i, card in enumerate(cards):
         status = "" if not card["used"] else " (Використано)"
         # Name button shows info
-        builder.button(text=f"{card['name']}{status}", callback_data=f"info_card_{i}_{room_code}")
+        builder.button(text=f"{card['name']}{status}", callback_data=pack("info_card", index=i, code=room_code))
         sizes.append(1)
         
         if not card["used"] and card["type"] == "active":
-             builder.button(text="⚡ Використати", callback_data=f"use_card_{i}_{room_code}")
+             builder.button(text="⚡ Використати", callback_data=pack("use_card", index=i, code=room_code))
              sizes.append(1)
              
-    builder.button(text="🔙 Назад", callback_data=f"back_to_game_{room_code}")
+    builder.button(text="🔙 Назад", callback_data=pack("back_to_game", code=room_code))
     sizes.append(1)
     
     builder.adjust(*sizes)
     return builder.as_markup()
 
-def target_selection_menu(room_code: str, players: list, action_index: int) -> InlineKeyboardMarkup:
+@cached_keyboard(lambda room_code, players, action_index, version=None: version and (room_code, version, action_index, tuple(p.id for p in players)))
+def target_selection_menu(room_code: str, players: list, action_index: int, version: int = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for player in players:
         if player.is_alive:
             name = player.user.full_name or player.user.username
-            builder.button(text=f"🎯 {name}", callback_data=f"target_{player.id}_{action_index}_{room_code}")
-    builder.button(text="🔙 Назад", callback_data=f"action_cards_{room_code}")
+            builder.button(text=f"🎯 {name}", callback_data=pack("target", target_id=player.id, index=action_index, code=room_code))
+    builder.button(text="🔙 Назад", callback_data=pack("action_cards", code=room_code))
     builder.adjust(2)
     return builder.as_markup()
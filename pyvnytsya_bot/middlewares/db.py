@@ -3,10 +3,37 @@ from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
+class LazySession:
+    """
+    Stands in for an AsyncSession and only creates the real one the first time
+    a handler touches it, so updates served from memory never reach the pool.
+    """
+
+    __slots__ = ("_session_pool", "_session")
+
+    def __init__(self, session_pool: async_sessionmaker):
+        self._session_pool = session_pool
+        self._session = None
+
+    @property
+    def created(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._session_pool()
+        return getattr(self._session, name)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
 class DbSessionMiddleware(BaseMiddleware):
     def __init__(self, session_pool: async_sessionmaker):
         super().__init__()
         self.session_pool = session_pool
+        self.updates = 0 # all updates seen
+        self.db_updates = 0 # updates whose handlers actually used the session
 
     async def __call__(
         self,
@@ -14,6 +41,12 @@ class DbSessionMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        async with self.session_pool() as session:
-            data["session"] = session
+        self.updates += 1
+        session = LazySession(self.session_pool)
+        data["session"] = session
+        try:
             return await handler(event, data)
+        finally:
+            if session.created:
+                self.db_updates += 1
+                await session.close()
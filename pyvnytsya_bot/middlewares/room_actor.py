@@ -0,0 +1,46 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, CallbackQuery, Message
+
+from ..keyboards.callbacks import unpack
+from ..services.room_actors import RoomActors
+from ..states.game_states import JoinRoom
+
+# Callbacks that only render from the room cache; they never have to wait for the room's turn
+READ_ONLY_ACTIONS = frozenset({
+    "reveal_menu", "my_status", "view_scenario", "back_to_game", "view_table",
+    "action_cards", "info_card", "refresh_game", "settings", "back_to_room",
+    "choose_pack", "get_template", "upload_pack",
+})
+
+def room_code_of(event: TelegramObject, data: Dict[str, Any]):
+    """Room code a state-changing update belongs to, or None."""
+    if isinstance(event, CallbackQuery) and event.data:
+        try:
+            action, fields = unpack(event.data)
+        except ValueError:
+            return None
+        # Decoded once: the callback dispatcher reuses it
+        data["callback_payload"] = (action, fields)
+        return None if action in READ_ONLY_ACTIONS else fields.get("code")
+    if isinstance(event, Message) and event.text and data.get("raw_state") == JoinRoom.waiting_for_code.state:
+        return event.text.upper().strip()
+    return None
+
+class RoomActorMiddleware(BaseMiddleware):
+    """Runs every state-changing update of a room in that room's actor, one at a time."""
+
+    def __init__(self, actors: RoomActors):
+        super().__init__()
+        self.actors = actors
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        code = room_code_of(event, data)
+        if code is None:
+            return await handler(event, data)
+        return await self.actors.run(code, lambda: handler(event, data))
@@ -0,0 +1,75 @@
+from sqlalchemy import select
+
+from ..config import config
+from ..database.models import Room, Player
+
+
+class ActiveRoomIndex:
+    """
+    Maps Telegram user id -> code of the running game they are in.
+    Lets the chat relay drop messages from non-players without a DB query.
+    Rebuilt from the DB at startup, then kept up to date by the game handlers.
+
+    With several workers (`shared=True`) games started by another worker are
+    missing here, so a miss is looked up in the DB and the result filled in.
+    """
+
+    def __init__(self, shared: bool = False):
+        self.shared = shared
+        self._room_by_user = {}
+        self._users_by_room = {}
+
+    async def rebuild(self, session):
+        self._room_by_user.clear()
+        self._users_by_room.clear()
+        result = await session.execute(
+            select(Player.user_id, Room.code)
+            .join(Room, Player.room_id == Room.id)
+            .where(Room.is_active == True, Room.is_finished == False, Player.user_id > 0)
+            .order_by(Room.id)
+        )
+        # Newest room wins if a user is somehow in several running games
+        for user_id, code in result.all():
+            self._add(user_id, code)
+
+    def _add(self, user_id, code):
+        previous = self._room_by_user.get(user_id)
+        if previous is not None and previous != code:
+            self._users_by_room.get(previous, set()).discard(user_id)
+        self._room_by_user[user_id] = code
+        self._users_by_room.setdefault(code, set()).add(user_id)
+
+    def add_room(self, code, user_ids):
+        for user_id in user_ids:
+            self._add(user_id, code)
+
+    def remove_room(self, code):
+        for user_id in self._users_by_room.pop(code, ()):
+            if self._room_by_user.get(user_id) == code:
+                del self._room_by_user[user_id]
+
+    def get(self, user_id):
+        return self._room_by_user.get(user_id)
+
+    async def lookup(self, session, user_id):
+        """Code of the running game `user_id` is in; goes to the DB on a miss when shared."""
+        code = self._room_by_user.get(user_id)
+        if code is not None or not self.shared:
+            return code
+        result = await session.execute(
+            select(Room.code)
+            .join(Player, Player.room_id == Room.id)
+            .where(Player.user_id == user_id, Room.is_active == True, Room.is_finished == False)
+            .order_by(Room.id.desc())
+            .limit(1)
+        )
+        code = result.scalar_one_or_none()
+        if code is not None:
+            self._add(user_id, code)
+        return code
+
+    def __len__(self):
+        return len(self._room_by_user)
+
+
+active_rooms = ActiveRoomIndex(shared=config.WORKERS > 1)
@@ -2,10 +2,18 @@ import json
 import asyncio
 import logging
 import random
-from ..utils.game_utils import format_player_card
+
+import numpy as np
+
+from ..utils.game_utils import format_player_card, revealed_traits
+from ..utils.matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
+def random_generator():
+    """NumPy generator seeded from `random`, so random.seed() keeps games reproducible."""
+    return np.random.default_rng(random.getrandbits(64))
+
 class BotAI:
     def __init__(self):
         # --- EXTENDED HEURISTIC KEYWORDS FOR CUSTOM PACK SUPPORT ---
@@ -59,29 +67,67 @@ class BotAI:
             "Солярк", "Мап", "Компас", "Телефон"
         ]
 
-    def check_keyword(self, text, keywords):
-        """Case-insensitive partial match."""
-        text = text.lower()
-        for k in keywords:
-            if k.lower() in text:
-                return True
-        return False
+        # Scenario-specific lists used on top of the general ones above
+        self.scenario_keywords = {
+            "contagious": ["ВІЛ", "Гепатит", "Туберкульоз", "Зараж", "Contagious", "Virus"],
+            "war_profession": ["Військовий", "Soldier", "Military", "Officer"],
+            "bio_profession": ["Лікар", "Біолог", "Doctor", "Medic", "Biologist"],
+            "cold_profession": ["Інженер", "Будівельник", "Engineer", "Builder"],
+            "cold_inventory": ["Одяг", "Ковдра", "Вогонь", "Clothes", "Blanket", "Fire"],
+            "war_inventory": ["Зброя", "Рація", "Weapon", "Radio"],
+            "weapon": ["Зброя", "Пістолет", "Weapon", "Gun", "Rifle"],
+            "cold_phobia": ["Холод", "Сніг"],
+            "water_phobia": ["Вода"],
+            "war_phobia": ["Кров", "Гучні звуки"],
+        }
+
+        # Scenario tags, in the order analyze_scenario reports them
+        self.scenario_tags = {
+            "cold": ["зима", "холод", "сніг", "мороз", "льодовиковий"],
+            "bio": ["вірус", "епідемія", "хвороба", "зараження", "зомбі"],
+            "war": ["війна", "ядерна", "вибух", "радіація", "бомба"],
+            "flood": ["повінь", "вода", "цунамі", "океан"],
+            "famine": ["голод", "посуха", "пустеля"],
+        }
+
+        # Every family compiled once into a single automaton
+        families = {
+            "bad_health": self.bad_health_keywords,
+            "good_health": self.good_health_keywords,
+            "bad_profession": self.bad_professions,
+            "good_profession": self.good_professions,
+            "useful_inventory": self.useful_inventory,
+            **self.scenario_keywords,
+            **{f"tag_{tag}": words for tag, words in self.scenario_tags.items()},
+        }
+        self.matcher = KeywordMatcher(families)
 
     def analyze_scenario(self, text):
         """Simple keyword matching to guess scenario type."""
-        text = text.lower()
-        tags = []
-        if any(w in text for w in ["зима", "холод", "сніг", "мороз", "льодовиковий"]):
-            tags.append("cold")
-        if any(w in text for w in ["вірус", "епідемія", "хвороба", "зараження", "зомбі"]):
-            tags.append("bio")
-        if any(w in text for w in ["війна", "ядерна", "вибух", "радіація", "бомба"]):
-            tags.append("war")
-        if any(w in text for w in ["повінь", "вода", "цунамі", "океан"]):
-            tags.append("flood")
-        if any(w in text for w in ["голод", "посуха", "пустеля"]):
-            tags.append("famine")
-        return tags
+        found = self.matcher.classify(text)
+        return [tag for tag in self.scenario_tags if f"tag_{tag}" in found]
+
+    def pick_targets(self, bot_ids, candidate_ids, base_scores, noise=15):
+        """
+        Builds the bots x candidates score matrix (base score + random noise of
+        +/- `noise`), masks each bot's own column and takes the argmax per row
+        (highest score = worst player). Returns a candidate index per bot, or
+        None when a bot has nobody else to vote for.
+        """
+        rows, cols = len(bot_ids), len(candidate_ids)
+        if not rows or not cols:
+            return [None] * rows
+
+        column_of = {cid: i for i, cid in enumerate(candidate_ids)}
+        own = [column_of.get(bid) for bid in bot_ids]
+
+        matrix = np.asarray(base_scores, dtype=np.float64) + random_generator().integers(-noise, noise + 1, size=(rows, cols))
+        for row, col in enumerate(own):
+            if col is not None:
+                matrix[row, col] = -np.inf
+        best = matrix.argmax(axis=1).tolist()
+
+        return [None if cols == 1 and own[row] == 0 else best[row] for row in range(rows)]
 
     async def decide_votes_batch(self, bots, room, survivors):
         """
@@ -100,34 +146,36 @@ class BotAI:
                 reasons = []
                 
                 # Parse traits from revealed info
-                revealed = p.revealed_traits.split(",") if p.revealed_traits else []
+                revealed = revealed_traits(p.revealed_mask)
                 
                 # --- 1. Health Analysis ---
                 if "health" in revealed:
                     health_val = p.health
-                    if self.check_keyword(health_val, self.bad_health_keywords):
+                    health = self.matcher.classify(health_val)
+                    if "bad_health" in health:
                         penalty = 50
-                        if "bio" in scenario_tags and self.check_keyword(health_val, ["ВІЛ", "Гепатит", "Туберкульоз", "Зараж", "Contagious", "Virus"]):
+                        if "bio" in scenario_tags and "contagious" in health:
                             penalty += 30 # Extra penalty for contagious diseases in bio scenario
                             reasons.append(f"заразний ({health_val})")
                         else:
                             reasons.append(f"хворий ({health_val})")
                         score += penalty
-                    elif self.check_keyword(health_val, self.good_health_keywords):
+                    elif "good_health" in health:
                         score -= 20
                         
                 # --- 2. Profession Analysis ---
                 if "profession" in revealed:
                     prof_val = p.profession
-                    if self.check_keyword(prof_val, self.bad_professions):
+                    prof = self.matcher.classify(prof_val)
+                    if "bad_profession" in prof:
                         score += 30
                         reasons.append(f"марна професія ({prof_val})")
-                    elif self.check_keyword(prof_val, self.good_professions):
+                    elif "good_profession" in prof:
                         bonus = 30
                         # Scenario bonuses
-                        if "war" in scenario_tags and self.check_keyword(prof_val, ["Військовий", "Soldier", "Military", "Officer"]): bonus += 20
-                        if "bio" in scenario_tags and self.check_keyword(prof_val, ["Лікар", "Біолог", "Doctor", "Medic", "Biologist"]): bonus += 20
-                        if "cold" in scenario_tags and self.check_keyword(prof_val, ["Інженер", "Будівельник", "Engineer", "Builder"]): bonus += 20
+                        if "war" in scenario_tags and "war_profession" in prof: bonus += 20
+                        if "bio" in scenario_tags and "bio_profession" in prof: bonus += 20
+                        if "cold" in scenario_tags and "cold_profession" in prof: bonus += 20
                         score -= bonus
                 
                 # --- 3. Age Analysis ---
@@ -148,15 +196,15 @@ class BotAI:
 
                 # --- 4. Inventory Analysis ---
                 if "inventory" in revealed:
-                    inv_val = p.inventory
-                    if self.check_keyword(inv_val, self.useful_inventory):
+                    inv = self.matcher.classify(p.inventory)
+                    if "useful_inventory" in inv:
                         score -= 15
-                        if "cold" in scenario_tags and self.check_keyword(inv_val, ["Одяг", "Ковдра", "Вогонь", "Clothes", "Blanket", "Fire"]):
+                        if "cold" in scenario_tags and "cold_inventory" in inv:
                             score -= 20
-                        if "war" in scenario_tags and self.check_keyword(inv_val, ["Зброя", "Рація", "Weapon", "Radio"]):
+                        if "war" in scenario_tags and "war_inventory" in inv:
                             score -= 20
                     
-                    if self.check_keyword(inv_val, ["Зброя", "Пістолет", "Weapon", "Gun", "Rifle"]):
+                    if "weapon" in inv:
                         # Weapon is double-edged: useful in war, threat otherwise
                         if "war" in scenario_tags or "zombie" in scenario_tags:
                             score -= 10
@@ -166,40 +214,30 @@ class BotAI:
 
                 # --- 5. Phobia Analysis (Scenario specific) ---
                 if "phobia" in revealed:
-                    phobia_val = p.phobia
-                    if "cold" in scenario_tags and ("Холод" in phobia_val or "Сніг" in phobia_val):
+                    phobia = self.matcher.classify(p.phobia)
+                    if "cold" in scenario_tags and "cold_phobia" in phobia:
                         score += 40
                         reasons.append(f"боїться холоду")
-                    if "flood" in scenario_tags and ("Вода" in phobia_val):
+                    if "flood" in scenario_tags and "water_phobia" in phobia:
                         score += 40
                         reasons.append(f"боїться води")
-                    if "war" in scenario_tags and ("Кров" in phobia_val or "Гучні звуки" in phobia_val):
+                    if "war" in scenario_tags and "war_phobia" in phobia:
                         score += 30
                         reasons.append(f"не підходить для війни")
 
                 scores[p.id] = {"score": score, "reasons": reasons}
 
             # Decide for each bot
-            for bot in bots:
-                # Filter candidates (exclude self)
-                candidates = [pid for pid in scores.keys() if pid != bot.id]
-                
-                if not candidates:
+            # Score every bot against every candidate at once
+            candidate_ids = list(scores.keys())
+            base_scores = [scores[cid]["score"] for cid in candidate_ids]
+            picks = self.pick_targets([bot.id for bot in bots], candidate_ids, base_scores)
+
+            for bot, pick in zip(bots, picks):
+                if pick is None:
                     continue
-                    
-                # Add some randomness to scores to avoid all bots voting same
-                bot_candidates = []
-                for cid in candidates:
-                    base_score = scores[cid]["score"]
-                    # Random variance +/- 15
-                    final_score = base_score + random.randint(-15, 15)
-                    bot_candidates.append((cid, final_score))
-                
-                # Sort by score descending (highest score = worst player)
-                bot_candidates.sort(key=lambda x: x[1], reverse=True)
-                
-                # Pick top candidate
-                target_id = bot_candidates[0][0]
+
+                target_id = candidate_ids[pick]
                 target_reasons = scores[target_id]["reasons"]
                 
                 reason_text = "Мені він не подобається."
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_text(text: str, limit: int = MAX_MESSAGE_LENGTH) -> list:
+    """
+    Splits text into chunks of at most `limit` characters, at a line break (or
+    else a space) where possible, so Markdown entities on a line stay whole.
+    """
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit + 1)
+        if cut <= 0:
+            chunks.append(text[:limit])
+            text = text[limit:]
+        else:
+            chunks.append(text[:cut])
+            text = text[cut + 1:] # the separator itself is dropped
+    chunks.append(text)
+    return chunks
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity` stored."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Takes a token and returns how long the caller must wait before using it."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0
+        if self.tokens < 0:
+            wait = -self.tokens / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds: float):
+        """Pauses the bucket, e.g. after Telegram answered with RetryAfter."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class BroadcastReport:
+    """Per-recipient outcome of a broadcast: chat_id -> None on success or the exception."""
+
+    def __init__(self, results: dict):
+        self.results = results
+
+    @property
+    def sent(self) -> list:
+        return [chat_id for chat_id, error in self.results.items() if error is None]
+
+    @property
+    def failed(self) -> dict:
+        return {chat_id: error for chat_id, error in self.results.items() if error is not None}
+
+    def __repr__(self):
+        return f"<BroadcastReport sent={len(self.sent)} failed={len(self.failed)}>"
+
+
+class Broadcaster:
+    """
+    Sends messages to many chats concurrently while respecting Telegram limits:
+    a global bucket (~30 msg/s for the whole bot) and a bucket per chat.
+    """
+
+    def __init__(self, global_rate: float = 30, per_chat_rate: float = 1, per_chat_burst: float = 3,
+                 max_retries: int = 3, max_chats: int = 10000):
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.set_limits(global_rate, per_chat_rate, per_chat_burst)
+
+    def set_limits(self, global_rate: float, per_chat_rate: float, per_chat_burst: float = 3):
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets = OrderedDict()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+            self.chat_buckets[chat_id] = bucket
+            # Forget chats whose buckets are full again, oldest first
+            while len(self.chat_buckets) > self.max_chats:
+                oldest_id, oldest = next(iter(self.chat_buckets.items()))
+                if not oldest.idle:
+                    break
+                del self.chat_buckets[oldest_id]
+        else:
+            self.chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def _acquire(self, chat_id):
+        chat_bucket = self._chat_bucket(chat_id)
+        wait = max(chat_bucket.delay(), self.global_bucket.delay())
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def call(self, chat_id, method, /, *args, **kwargs):
+        """Runs a Bot API call for `chat_id` under the rate limits, retrying on RetryAfter."""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id)
+            try:
+                return await method(*args, **kwargs)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Flood control for {chat_id}, retrying in {e.retry_after}s")
+                self._chat_bucket(chat_id).block(e.retry_after)
+
+    async def send(self, bot: Bot, chat_id: int, text: str, parse_mode: str = "Markdown", reply_markup=None):
+        """Sends one message, split into 4096-character chunks if needed."""
+        chunks = split_text(text)
+        for i, chunk in enumerate(chunks):
+            # Only attach markup to the last chunk
+            markup = reply_markup if i == len(chunks) - 1 else None
+            await self.call(chat_id, bot.send_message, chat_id, chunk, parse_mode=parse_mode, reply_markup=markup)
+
+    async def fan_out(self, chat_ids, job) -> BroadcastReport:
+        """Runs `job(chat_id)` for every recipient concurrently and collects the outcomes."""
+        chat_ids = list(dict.fromkeys(chat_ids))
+
+        async def run(chat_id):
+            try:
+                await job(chat_id)
+            except Exception as e:
+                logger.error(f"Failed to send to {chat_id}: {e}")
+                return e
+            return None
+
+        results = await asyncio.gather(*(run(chat_id) for chat_id in chat_ids))
+        return BroadcastReport(dict(zip(chat_ids, results)))
+
+    async def broadcast(self, bot: Bot, chat_ids, text: str, parse_mode: str = "Markdown", reply_markup=None) -> BroadcastReport:
+        """
+        Sends the same text to every chat. `reply_markup` may be a markup or a
+        callable `chat_id -> markup` for per-recipient keyboards.
+        """
+        async def job(chat_id):
+            markup = reply_markup(chat_id) if callable(reply_markup) else reply_markup
+            await self.send(bot, chat_id, text, parse_mode=parse_mode, reply_markup=markup)
+
+        return await self.fan_out(chat_ids, job)
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+
+def markup_hash(markup) -> int:
+    if markup is None:
+        return 0
+    return hash(tuple(
+        tuple((button.text, button.callback_data, button.url) for button in row)
+        for row in markup.inline_keyboard
+    ))
+
+
+class Tracked:
+    """What we last put into one message, and the edit waiting to replace it."""
+
+    def __init__(self):
+        self.content = None # hash of (text, markup, parse_mode) last sent
+        self.shown = None # hash of the text Telegram reported after that edit
+        self.sent_at = 0.0
+        self.pending = None # (message, text, reply_markup, parse_mode, content)
+        self.timer = None
+
+
+class EditTracker:
+    """
+    Edits callback messages without wasting Bot API calls. Remembers a hash of
+    the text and keyboard last sent to each (chat, message) (the `max_messages`
+    most recent ones) and skips an edit that would change nothing, instead of
+    sending it and swallowing "message is not modified". Edits to one message
+    less than `debounce` seconds apart are coalesced: only the latest is sent,
+    once the interval has passed.
+    """
+
+    def __init__(self, debounce: float = 0.5, max_messages: int = 10000):
+        self.debounce = debounce
+        self.max_messages = max_messages
+        self._messages = OrderedDict() # (chat id, message id) -> Tracked
+        self.hits = 0 # identical edits skipped
+        self.misses = 0 # edits sent
+        self.debounced = 0 # edits replaced by a later one before being sent
+        self.failed = 0
+
+    def _tracked(self, key) -> Tracked:
+        tracked = self._messages.get(key)
+        if tracked is None:
+            tracked = self._messages[key] = Tracked()
+            while len(self._messages) > self.max_messages:
+                self._messages.popitem(last=False)
+        else:
+            self._messages.move_to_end(key)
+        return tracked
+
+    async def edit(self, message, text: str, reply_markup=None, parse_mode: str = None):
+        """Edits `message` (a callback's message) unless it already shows exactly this."""
+        key = (message.chat.id, message.message_id)
+        content = hash((text, markup_hash(reply_markup), parse_mode))
+        tracked = self._tracked(key)
+
+        if tracked.timer is not None:
+            # A burst: the newest edit replaces the one already waiting
+            if tracked.pending[4] == content:
+                self.hits += 1
+            else:
+                self.debounced += 1
+                tracked.pending = (message, text, reply_markup, parse_mode, content)
+            return
+
+        if tracked.content == content and tracked.shown == hash(getattr(message, "text", None)):
+            # Still shows what we sent last, and nobody has edited it since
+            self.hits += 1
+            return
+
+        wait = tracked.sent_at + self.debounce - time.monotonic()
+        if wait > 0:
+            if tracked.content == content:
+                self.hits += 1
+                return
+            tracked.pending = (message, text, reply_markup, parse_mode, content)
+            tracked.timer = asyncio.create_task(self._send_later(tracked, wait))
+            return
+
+        await self._send(tracked, message, text, reply_markup, parse_mode, content)
+
+    async def _send_later(self, tracked: Tracked, wait: float):
+        await asyncio.sleep(wait)
+        message, text, reply_markup, parse_mode, content = tracked.pending
+        tracked.pending = tracked.timer = None
+        if content == tracked.content:
+            self.hits += 1
+            return
+        await self._send(tracked, message, text, reply_markup, parse_mode, content)
+
+    async def _send(self, tracked: Tracked, message, text, reply_markup, parse_mode, content):
+        self.misses += 1
+        tracked.sent_at = time.monotonic()
+        try:
+            edited = await message.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        except TelegramAPIError as e:
+            # "message is not modified" means it already shows this. After anything else (deleted,
+            # too old, network errors, flood control) what it shows is unknown
+            self.failed += 1
+            bad_request = isinstance(e, TelegramBadRequest)
+            (logger.debug if bad_request else logger.warning)(f"Edit of {message.chat.id}/{message.message_id} failed: {e}")
+            tracked.content = content if bad_request and "not modified" in str(e) else None
+            tracked.shown = hash(getattr(message, "text", None))
+            return
+        tracked.content = content
+        tracked.shown = hash(getattr(edited, "text", None))
+
+    async def close(self):
+        """Sends every edit still waiting out its debounce interval."""
+        waiting = [tracked for tracked in self._messages.values() if tracked.timer is not None]
+        edits = []
+        for tracked in waiting:
+            tracked.timer.cancel()
+            edits.append(self._send(tracked, *tracked.pending))
+            tracked.pending = tracked.timer = None
+        # One failed edit must not keep the others from being sent
+        results = await asyncio.gather(*edits, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Failed to send a pending edit: {result}")
+
+
+edit_tracker = EditTracker(debounce=config.EDIT_DEBOUNCE)
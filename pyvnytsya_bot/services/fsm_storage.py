@@ -0,0 +1,157 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Mapping
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+try:
+    from redis.asyncio import Redis
+except ImportError: # Redis is only needed for FSM_STORAGE=redis
+    Redis = None
+
+
+_KEEP = object()
+
+
+def state_name(state: StateType):
+    return state.state if isinstance(state, State) else state
+
+
+class TTLMemoryStorage(BaseStorage):
+    """
+    In-process FSM storage for a single worker. Every key expires `ttl` seconds
+    after its last write, and at most `max_keys` users are kept (least recently
+    used go first), so abandoned flows don't pile up.
+    """
+
+    def __init__(self, ttl: float = 3600, max_keys: int = 10000):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._records = OrderedDict() # key -> [state, data, expires_at]
+
+    def _record(self, key: StorageKey):
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if record[2] <= time.monotonic():
+            del self._records[key]
+            return None
+        self._records.move_to_end(key)
+        return record
+
+    def _write(self, key: StorageKey, state=_KEEP, data=_KEEP):
+        record = self._record(key) or [None, {}, 0.0]
+        if state is not _KEEP:
+            record[0] = state
+        if data is not _KEEP:
+            record[1] = data
+        # A cleared flow (no state, no data) is simply forgotten
+        if record[0] is None and not record[1]:
+            self._records.pop(key, None)
+            return
+        record[2] = time.monotonic() + self.ttl
+        self._records[key] = record
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_keys:
+            self._records.popitem(last=False)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._write(key, state=state_name(state))
+
+    async def get_state(self, key: StorageKey):
+        record = self._record(key)
+        return record[0] if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        self._write(key, data=data.copy())
+
+    async def get_data(self, key: StorageKey) -> dict:
+        record = self._record(key)
+        return record[1].copy() if record else {}
+
+    async def close(self) -> None:
+        self._records.clear()
+
+
+class RedisHashStorage(BaseStorage):
+    """
+    FSM storage shared by every worker: one Redis hash per user with `state` and
+    `data` fields. Each write is a single pipelined HSET (or HDEL) + EXPIRE round
+    trip, and a cleared flow leaves no key behind. Works with any client that
+    speaks the redis.asyncio API (e.g. fakeredis for local runs).
+
+    aiogram reads the state on every update and the data only when a handler asks
+    for it, so get_state fetches both fields with one HMGET and keeps the data for
+    up to `prefetch_ttl` seconds: the handler's get_data needs no second round
+    trip. (aiogram's RedisStorage stores them under two keys and always needs two.)
+    """
+
+    def __init__(self, redis, ttl: int = 3600, key_builder: KeyBuilder = None,
+                 prefetch_ttl: float = 1.0, max_prefetched: int = 10000):
+        self.redis = redis
+        self.ttl = ttl
+        self.key_builder = key_builder or DefaultKeyBuilder(prefix="fsm")
+        self.prefetch_ttl = prefetch_ttl
+        self.max_prefetched = max_prefetched
+        self._prefetched = OrderedDict() # key name -> (raw data, expires_at)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisHashStorage":
+        if Redis is None:
+            raise RuntimeError("FSM_STORAGE=redis needs the 'redis' package (pip install redis)")
+        return cls(Redis.from_url(url), **kwargs)
+
+    async def _write(self, key: StorageKey, field: str, value):
+        name = self.key_builder.build(key)
+        self._prefetched.pop(name, None)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if value is None:
+                pipe.hdel(name, field)
+            else:
+                pipe.hset(name, field, value)
+                pipe.expire(name, self.ttl)
+            await pipe.execute()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(key, "state", state_name(state))
+
+    async def get_state(self, key: StorageKey):
+        name = self.key_builder.build(key)
+        value, data = await self.redis.hmget(name, "state", "data")
+        self._prefetched.pop(name, None)
+        self._prefetched[name] = (data, time.monotonic() + self.prefetch_ttl)
+        while len(self._prefetched) > self.max_prefetched:
+            self._prefetched.popitem(last=False)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        await self._write(key, "data", json.dumps(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> dict:
+        name = self.key_builder.build(key)
+        prefetched = self._prefetched.pop(name, None)
+        if prefetched is not None and prefetched[1] > time.monotonic():
+            value = prefetched[0]
+        else:
+            value = await self.redis.hget(name, "data")
+        return json.loads(value) if value else {}
+
+    async def close(self) -> None:
+        self._prefetched.clear()
+        await self.redis.aclose()
+
+
+def create_fsm_storage(config) -> BaseStorage:
+    """FSM storage selected by FSM_STORAGE ("memory" or "redis")."""
+    if config.FSM_STORAGE == "redis":
+        return RedisHashStorage.from_url(config.REDIS_URL, ttl=config.FSM_TTL)
+    if config.FSM_STORAGE == "memory":
+        return TTLMemoryStorage(ttl=config.FSM_TTL, max_keys=config.FSM_MAX_KEYS)
+    raise ValueError(f"Unknown FSM_STORAGE: {config.FSM_STORAGE!r}")
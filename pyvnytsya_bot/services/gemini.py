@@ -1,16 +1,139 @@
 import asyncio
+import contextlib
+import logging
+from google.ai import generativelanguage as glm
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, InternalServerError
 from goodbye_quota import GoodbyeQuota
 from ..config import config
 
+logger = logging.getLogger(__name__)
+
+SCENARIO_SEPARATOR = "====="
+MODEL_NAME = "models/gemini-2.5-flash-lite"
+
+def response_text(response) -> str:
+    """Text of the first candidate; ValueError if it has none (e.g. a safety stop)."""
+    parts = response.candidates[0].content.parts if response.candidates else []
+    if not any(part.text for part in parts):
+        raise ValueError("Response has no text parts")
+    return "".join(part.text for part in parts)
+
 class AIService:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 8, timeout: float = 20.0, ending_timeout: float = 30.0):
         # Split the comma-separated string into a list of keys
         raw_keys = config.GEMINI_API_KEY.get_secret_value()
         keys = [k.strip() for k in raw_keys.split(',') if k.strip()]
+        # GoodbyeQuota only drives key rotation here; requests go through the async clients below
         self.client = GoodbyeQuota(keys)
-        self.model = self.client.create_model('gemini-2.5-flash-lite') 
+        self._clients = {} # api key -> its own async client
 
-    async def generate_scenario(self, custom_prompt: str = None) -> str:
+        self.timeout = timeout
+        self.ending_timeout = ending_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # Metrics
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    def _client_for(self, key: str):
+        client = self._clients.get(key)
+        if client is None:
+            # The API key is fixed per client (genai.configure() is process-global), so one client per key
+            client = self._clients[key] = glm.GenerativeServiceAsyncClient(client_options={"api_key": key})
+        return client
+
+    async def _call_with_rotation(self, prompt: str, deadline: float, stream: bool = False):
+        loop = asyncio.get_running_loop()
+        key_manager = self.client.key_manager
+        request = glm.GenerateContentRequest(
+            model=MODEL_NAME,
+            contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+        )
+        for _ in range(self.client.max_retries):
+            key = key_manager.get_key()
+            remaining = max(deadline - loop.time(), 0.1)
+            client = self._client_for(key)
+            try:
+                if stream:
+                    return await client.stream_generate_content(request, timeout=remaining)
+                return await client.generate_content(request, timeout=remaining)
+            except ResourceExhausted:
+                key_manager.report_exhausted(key)
+            except (ServiceUnavailable, InternalServerError):
+                logger.warning("Gemini service error, retrying...")
+                await asyncio.sleep(1)
+        raise Exception("All keys exhausted or max retries reached.")
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, deadline: float):
+        """Holds one of the global concurrency slots, waiting for it no longer than the deadline."""
+        loop = asyncio.get_running_loop()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+            self.completed += 1
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _generate(self, prompt: str, timeout: float = None):
+        """
+        One Gemini request under the global concurrency limit. The deadline covers
+        both waiting for a slot and the request itself; on timeout or cancellation
+        the underlying RPC is cancelled and the slot released.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        async with self._slot(deadline):
+            return await asyncio.wait_for(self._call_with_rotation(prompt, deadline), deadline - loop.time())
+
+    async def _stream(self, prompt: str, timeout: float = None):
+        """Like _generate, but yields text chunks as they arrive. The slot is held until the stream ends."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        async with self._slot(deadline):
+            response = await asyncio.wait_for(self._call_with_rotation(prompt, deadline, stream=True), deadline - loop.time())
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                except StopAsyncIteration:
+                    break
+                try:
+                    text = response_text(chunk)
+                except ValueError: # Chunk without text parts (e.g. safety stop)
+                    continue
+                if text:
+                    yield text
+
+    def stats(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+        }
+
+    def _scenario_prompt(self, custom_prompt: str = None) -> str:
         base_instruction = (
             "Ти - ведучий гри 'Бункер'. Придумай сценарій катастрофи. "
             "Будь лаконічним. Максимум 150 слів.\n"
@@ -25,11 +148,27 @@ class AIService:
             prompt = f"{base_instruction}\n\nВрахуй наступні побажання або сеттінг: {custom_prompt}"
         else:
             prompt = base_instruction
+        return prompt
 
-        response = await asyncio.to_thread(self.model.generate_content, prompt)
-        return response.text
+    async def generate_scenario(self, custom_prompt: str = None) -> str:
+        prompt = self._scenario_prompt(custom_prompt)
+        response = await self._generate(prompt)
+        return response_text(response)
 
-    async def generate_ending(self, survivors_info: str, scenario: str, custom_prompt: str = None) -> str:
+    async def generate_scenarios(self, count: int, custom_prompt: str = None) -> list:
+        """Several independent scenarios from a single API call."""
+        if count <= 1:
+            return [await self.generate_scenario(custom_prompt)]
+
+        prompt = (
+            f"{self._scenario_prompt(custom_prompt)}\n\n"
+            f"Придумай {count} різних незалежних сценаріїв за цими правилами. "
+            f"Розділи їх рядком, що містить лише {SCENARIO_SEPARATOR}"
+        )
+        response = await self._generate(prompt)
+        return [part.strip() for part in response_text(response).split(SCENARIO_SEPARATOR) if part.strip()]
+
+    def _ending_prompt(self, survivors_info: str, scenario: str, custom_prompt: str = None) -> str:
         base_instruction = (
             f"Ти - ведучий гри 'Бункер'. Гра закінчилася.\n\n"
             f"📜 **Початковий сценарій:**\n{scenario}\n\n"
@@ -45,13 +184,30 @@ class AIService:
             prompt = f"{base_instruction}\n\nВрахуй наступні побажання або сеттінг для кінцівки: {custom_prompt}"
         else:
             prompt = base_instruction
+        return prompt
+
+    async def generate_ending(self, survivors_info: str, scenario: str, custom_prompt: str = None) -> str:
+        prompt = self._ending_prompt(survivors_info, scenario, custom_prompt)
         try:
-            response = await asyncio.to_thread(self.model.generate_content, prompt)
-            if response and response.text:
-                return response.text
+            response = await self._generate(prompt, timeout=self.ending_timeout)
+            text = response_text(response) if response else None
+            if text:
+                return text
             else:
                 return "Історія завершилася мовчанням..."
+        except asyncio.TimeoutError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate ending: {e}")
 
-ai_service = AIService()
+    async def generate_ending_stream(self, survivors_info: str, scenario: str, custom_prompt: str = None):
+        """Streaming variant of generate_ending: yields the text in chunks as Gemini produces it."""
+        prompt = self._ending_prompt(survivors_info, scenario, custom_prompt)
+        async for chunk in self._stream(prompt, timeout=self.ending_timeout):
+            yield chunk
+
+ai_service = AIService(
+    max_concurrency=config.AI_MAX_CONCURRENCY,
+    timeout=config.AI_TIMEOUT,
+    ending_timeout=config.AI_ENDING_TIMEOUT,
+)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from .broadcaster import broadcaster, MAX_MESSAGE_LENGTH
+
+logger = logging.getLogger(__name__)
+
+
+def cut_point(text: str, limit: int) -> int:
+    """Where to split `text` so the first part fits in `limit`: last newline, else last space, else hard cut."""
+    for sep in ("\n", " "):
+        pos = text.rfind(sep, 0, limit)
+        if pos > limit // 2:
+            return pos + 1
+    return limit
+
+
+class LiveMessage:
+    """
+    A message shown in several chats at once and edited in place while its text
+    streams in. Edits are debounced to `interval` seconds; once the text outgrows
+    4096 characters the current messages are finalized and new ones continue it.
+
+    While streaming the text is sent without parse mode (half-written Markdown
+    would be rejected); every finished part is re-rendered with `render` and
+    `parse_mode`, falling back to plain text if Telegram can't parse it.
+    """
+
+    def __init__(self, bot: Bot, chat_ids, header: str = "", placeholder: str = "⏳",
+                 interval: float = 1.5, parse_mode: str = "Markdown", render=None, plain_render=None):
+        self.bot = bot
+        self.chat_ids = list(dict.fromkeys(chat_ids))
+        self.header = header
+        self.placeholder = placeholder
+        self.interval = interval
+        self.parse_mode = parse_mode
+        self.render = render or (lambda text: text)
+        self.plain_render = plain_render or (lambda text: text)
+
+        self.text = "" # current part (without header)
+        self.parts = 0 # finished parts so far
+        self.message_ids = {} # chat_id -> message id of the current part
+        self._shown = None
+        self._last_edit = 0.0
+
+    def _prefix(self) -> str:
+        return self.header if self.parts == 0 else ""
+
+    async def _send_current(self, text: str):
+        async def send(chat_id):
+            message = await broadcaster.call(chat_id, self.bot.send_message, chat_id, text)
+            self.message_ids[chat_id] = message.message_id
+
+        self.message_ids = {}
+        await broadcaster.fan_out(self.chat_ids, send)
+        self._shown = text
+
+    async def _edit_current(self, text: str, parse_mode=None):
+        async def edit(chat_id):
+            message_id = self.message_ids.get(chat_id)
+            if message_id is None:
+                return
+            try:
+                await broadcaster.call(chat_id, self.bot.edit_message_text, text=text, chat_id=chat_id, message_id=message_id, parse_mode=parse_mode)
+            except TelegramBadRequest as e:
+                if "not modified" in str(e):
+                    return
+                if parse_mode is None:
+                    raise
+                # Telegram couldn't parse the Markdown, show it as plain text
+                await broadcaster.call(chat_id, self.bot.edit_message_text, text=self._plain(), chat_id=chat_id, message_id=message_id)
+
+        await broadcaster.fan_out(self.chat_ids, edit)
+        self._shown = text
+        self._last_edit = asyncio.get_running_loop().time()
+
+    def _plain(self) -> str:
+        return self._prefix_plain() + self.plain_render(self.text)
+
+    def _prefix_plain(self) -> str:
+        return self.plain_render(self._prefix())
+
+    async def start(self):
+        await self._send_current(self._prefix_plain() + self.placeholder)
+
+    async def _finalize_part(self):
+        """Renders the current part with Markdown for good."""
+        await self._edit_current(self._prefix() + self.render(self.text), parse_mode=self.parse_mode)
+
+    async def append(self, chunk: str):
+        self.text += chunk
+
+        # Roll over into new messages while the current part is too long
+        while len(self._prefix()) + len(self.text) > MAX_MESSAGE_LENGTH:
+            limit = MAX_MESSAGE_LENGTH - len(self._prefix())
+            cut = cut_point(self.text, limit)
+            rest = self.text[cut:]
+            self.text = self.text[:cut]
+            await self._finalize_part()
+            self.parts += 1
+            self.text = rest
+            await self._send_current(self._plain() or self.placeholder)
+
+        if asyncio.get_running_loop().time() - self._last_edit >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        text = self._plain()
+        if text and text != self._shown:
+            await self._edit_current(text)
+
+    async def finish(self, replacement: str = None):
+        """Final render. `replacement` replaces the whole current part (e.g. an error notice)."""
+        if replacement is not None:
+            self.text = replacement
+        if not self.text and self.parts:
+            return
+        await self._finalize_part()
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+from aiogram import Bot
+
+from ..config import config
+from .broadcaster import Broadcaster, broadcaster, split_text, MAX_MESSAGE_LENGTH
+
+logger = logging.getLogger(__name__)
+
+
+class Batch:
+    """Notifications waiting to be sent to one chat."""
+
+    def __init__(self, bot: Bot, room: str, parse_mode: str):
+        self.bot = bot
+        self.room = room
+        self.parse_mode = parse_mode
+        self.parts = []
+        self.length = 0
+        self.timer = None
+
+
+class RoomCounters:
+    def __init__(self):
+        self.events = 0 # notifications handed to the notifier
+        self.sends = 0 # messages actually sent for them
+
+    @property
+    def saved(self) -> int:
+        return self.events - self.sends
+
+
+class Notifier:
+    """
+    Coalesces game notifications per recipient: everything sent to a chat within
+    `window` seconds of the first pending notification goes out as one message
+    (split at line breaks past 4096 characters). A priority message, or one with
+    a keyboard, is appended to the pending text and sent at once, so it is never
+    delayed and never overtakes earlier notifications. window=0 sends right away.
+    """
+
+    def __init__(self, broadcaster: Broadcaster, window: float = 1.0, max_rooms: int = 1000):
+        self.broadcaster = broadcaster
+        self.window = window
+        self.max_rooms = max_rooms
+        self._batches = {} # chat_id -> Batch
+        self._rooms = OrderedDict() # room code -> RoomCounters
+
+    def counters(self, room: str) -> RoomCounters:
+        counters = self._rooms.get(room)
+        if counters is None:
+            counters = self._rooms[room] = RoomCounters()
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        else:
+            self._rooms.move_to_end(room)
+        return counters
+
+    @property
+    def events(self) -> int:
+        return sum(counters.events for counters in self._rooms.values())
+
+    @property
+    def sends(self) -> int:
+        return sum(counters.sends for counters in self._rooms.values())
+
+    @property
+    def saved(self) -> int:
+        return self.events - self.sends
+
+    async def notify(self, bot: Bot, chat_ids, text: str, room: str = None, parse_mode: str = "Markdown",
+                     reply_markup=None, priority: bool = False):
+        """
+        Queues `text` for every chat. `reply_markup` may be a markup or a callable
+        `chat_id -> markup`; a message with a keyboard is sent immediately, like a
+        priority one (only the last message of a batch can carry the keyboard).
+        """
+        chat_ids = list(dict.fromkeys(chat_ids))
+        counters = self.counters(room)
+        counters.events += len(chat_ids)
+        immediate = priority or reply_markup is not None or self.window <= 0
+
+        async def job(chat_id):
+            batch = self._batch(bot, chat_id, room, parse_mode)
+            if not immediate and batch.parts and batch.length + 1 + len(text) > MAX_MESSAGE_LENGTH:
+                # The pending message is full: send it and start the next one
+                await self._flush(chat_id)
+                batch = self._batch(bot, chat_id, room, parse_mode)
+            batch.length += len(text) + (1 if batch.parts else 0) # joined with "\n"
+            batch.parts.append(text)
+            if immediate:
+                markup = reply_markup(chat_id) if callable(reply_markup) else reply_markup
+                await self._flush(chat_id, reply_markup=markup)
+            elif batch.timer is None:
+                batch.timer = asyncio.create_task(self._flush_later(chat_id, batch))
+
+        if immediate:
+            return await self.broadcaster.fan_out(chat_ids, job)
+        for chat_id in chat_ids:
+            await job(chat_id)
+
+    def _batch(self, bot: Bot, chat_id: int, room: str, parse_mode: str) -> Batch:
+        batch = self._batches.get(chat_id)
+        if batch is not None and (batch.room != room or batch.parse_mode != parse_mode):
+            # Different room or formatting: send what is pending on its own (in the background, in order)
+            self._batches.pop(chat_id)
+            self._start(chat_id, batch)
+            batch = None
+        if batch is None:
+            batch = self._batches[chat_id] = Batch(bot, room, parse_mode)
+        return batch
+
+    async def _flush_later(self, chat_id: int, batch: Batch):
+        await asyncio.sleep(self.window)
+        if self._batches.get(chat_id) is batch:
+            del self._batches[chat_id]
+            batch.timer = None # this task is the one sending; don't cancel it
+            await self._send(chat_id, batch)
+
+    def _start(self, chat_id: int, batch: Batch):
+        if batch.timer is not None:
+            batch.timer.cancel()
+        batch.timer = asyncio.create_task(self._send(chat_id, batch))
+
+    async def _flush(self, chat_id: int, reply_markup=None):
+        batch = self._batches.pop(chat_id, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        await self._send(chat_id, batch, reply_markup)
+
+    async def _send(self, chat_id: int, batch: Batch, reply_markup=None):
+        chunks = split_text("\n".join(batch.parts))
+        self.counters(batch.room).sends += len(chunks)
+        try:
+            for i, chunk in enumerate(chunks):
+                # Only the last chunk carries the keyboard
+                markup = reply_markup if i == len(chunks) - 1 else None
+                await self.broadcaster.call(
+                    chat_id, batch.bot.send_message, chat_id, chunk, parse_mode=batch.parse_mode, reply_markup=markup,
+                )
+        except Exception as e:
+            logger.error(f"Failed to send notifications to {chat_id}: {e}")
+
+    async def flush(self, chat_ids=None):
+        """Sends everything pending now (for `chat_ids`, or for every chat)."""
+        chat_ids = list(self._batches) if chat_ids is None else chat_ids
+        await asyncio.gather(*(self._flush(chat_id) for chat_id in chat_ids))
+
+    async def close(self):
+        await self.flush()
+
+
+notifier = Notifier(broadcaster, window=config.NOTIFY_WINDOW)
@@ -0,0 +1,99 @@
+import json
+import logging
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from ..database.models import GamePack
+from ..utils.game_utils import compile_pack
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedPack:
+    """A game pack parsed and normalized once: trait lists, compiled samplers and AI prompts."""
+
+    def __init__(self, pack_id: int, name: str, raw: str):
+        full_pack = json.loads(raw)
+        pack_data = full_pack.get("data", {})
+        # Fallback for legacy packs (if data was saved as just the inner dict)
+        if not pack_data and "professions" in full_pack:
+            pack_data = full_pack
+
+        self.id = pack_id
+        self.name = name
+        self.data = pack_data
+        self.ai_prompts = full_pack.get("ai_prompts", {})
+        self.samplers = compile_pack(pack_data)
+        self.size = len(raw)
+
+    @property
+    def scenario_prompt(self):
+        return self.ai_prompts.get("scenario_prompt")
+
+    @property
+    def ending_prompt(self):
+        return self.ai_prompts.get("ending_prompt")
+
+
+class PackCache:
+    """
+    LRU cache of ParsedPack keyed by (pack id, content version), bounded by the
+    total size of the raw JSON it was parsed from. `invalidate` bumps the version
+    so a changed or deleted pack is never served from memory again.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict() # (pack_id, version) -> ParsedPack
+        self._versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, pack_id):
+        return (pack_id, self._versions.get(pack_id, 0))
+
+    async def get(self, session, pack_id):
+        """Parsed pack by id, loading it from the DB on a miss. None if missing or broken."""
+        key = self._key(pack_id)
+        pack = self._entries.get(key)
+        if pack is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pack
+
+        self.misses += 1
+        result = await session.execute(select(GamePack).where(GamePack.id == pack_id))
+        row = result.scalar_one_or_none()
+        if not row:
+            return None
+        try:
+            pack = ParsedPack(row.id, row.name, row.data)
+        except Exception as e:
+            logger.error(f"Failed to load pack {pack_id}: {e}")
+            return None
+
+        # The version may have changed while we were waiting on the DB
+        if key == self._key(pack_id):
+            self._store(key, pack)
+        return pack
+
+    def _store(self, key, pack):
+        # Two concurrent misses for the same pack both store it: count it once
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous.size
+        self._entries[key] = pack
+        self.total_bytes += pack.size
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+
+    def invalidate(self, pack_id):
+        self._versions[pack_id] = self._versions.get(pack_id, 0) + 1
+        for key in [key for key in self._entries if key[0] == pack_id]:
+            self.total_bytes -= self._entries.pop(key).size
+
+
+pack_cache = PackCache()
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+
+from ..utils.game_utils import format_player_card
+
+
+class RenderCache:
+    """
+    Rendered player cards keyed by (player id, player version, show_hidden), so a
+    card is formatted once per change of that player instead of on every view.
+    Players without a `version` (live ORM objects) are always formatted.
+    """
+
+    def __init__(self, max_cards: int = 20000):
+        self.max_cards = max_cards
+        self._cards = OrderedDict() # (player id, version, show_hidden) -> text
+        self.hits = 0
+        self.misses = 0
+
+    def card(self, player, show_hidden: bool = False) -> str:
+        version = getattr(player, "version", None)
+        if version is None:
+            return format_player_card(player, show_hidden=show_hidden)
+        key = (player.id, version, show_hidden)
+        text = self._cards.get(key)
+        if text is not None:
+            self._cards.move_to_end(key)
+            self.hits += 1
+            return text
+        self.misses += 1
+        text = self._cards[key] = format_player_card(player, show_hidden=show_hidden)
+        while len(self._cards) > self.max_cards:
+            self._cards.popitem(last=False)
+        return text
+
+    def table(self, room) -> str:
+        """The public player table (hidden traits stay hidden), assembled from cached cards."""
+        header = (
+            f"📋 *СТІЛ ГРАВЦІВ* | Раунд {room.round_number}\n"
+            f"➖➖➖➖➖➖➖➖➖➖\n\n"
+        )
+        return header + "".join([self.card(p) + "\n" for p in room.players])
+
+    def clear(self):
+        self._cards.clear()
+
+    def __len__(self):
+        return len(self._cards)
+
+
+render_cache = RenderCache()
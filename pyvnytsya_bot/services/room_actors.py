@@ -0,0 +1,76 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RoomActors:
+    """
+    One queue and one worker task per room: jobs for the same room run strictly
+    one after another, different rooms run in parallel. A worker that has had
+    nothing to do for `idle_timeout` seconds exits and forgets its room.
+    """
+
+    def __init__(self, idle_timeout: float = 60.0):
+        self.idle_timeout = idle_timeout
+        self._queues = {} # room code -> asyncio.Queue of (job, future)
+        self._workers = {} # room code -> worker task
+
+    def __len__(self):
+        return len(self._workers)
+
+    async def run(self, code: str, job):
+        """Runs `job()` (a coroutine function) in the room's turn and returns its result."""
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(code)
+        if queue is None:
+            queue = self._queues[code] = asyncio.Queue()
+            self._workers[code] = asyncio.create_task(self._work(code, queue))
+        queue.put_nowait((job, future))
+        return await future
+
+    async def _work(self, code: str, queue: asyncio.Queue):
+        try:
+            while True:
+                try:
+                    job, future = await asyncio.wait_for(queue.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    if queue.empty():
+                        # Nothing can be queued between this check and the removal (no await)
+                        return
+                    continue
+
+                if future.done(): # the caller gave up waiting
+                    continue
+                try:
+                    result = await job()
+                except asyncio.CancelledError:
+                    future.cancel()
+                    if asyncio.current_task().cancelling():
+                        raise
+                    # Only the job was cancelled: the room's other jobs still run
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            # However the worker ends, the next job for the room must start a new one
+            if self._workers.get(code) is asyncio.current_task():
+                del self._queues[code]
+                del self._workers[code]
+            while not queue.empty():
+                _, future = queue.get_nowait()
+                future.cancel()
+
+    async def close(self):
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._queues.clear()
+        self._workers.clear()
+
+
+room_actors = RoomActors()
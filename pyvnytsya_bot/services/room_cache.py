@@ -0,0 +1,154 @@
+import itertools
+import time
+from collections import OrderedDict
+
+from ..config import config
+
+ROOM_FIELDS = (
+    "id", "code", "creator_id", "is_active", "is_finished", "round_number",
+    "phase", "survivors_count", "scenario", "pack_id",
+)
+PLAYER_FIELDS = (
+    "id", "user_id", "room_id", "profession", "health", "hobby", "phobia",
+    "inventory", "fact", "age", "bio", "action_cards", "is_alive",
+    "revealed_mask", "has_voted", "revealed_count_round", "vote_weight",
+)
+USER_FIELDS = ("id", "username", "full_name")
+
+
+class View:
+    """Read-only copy of an ORM row that outlives its session."""
+
+    def __init__(self, obj, fields):
+        for field in fields:
+            setattr(self, field, getattr(obj, field))
+
+    def same_as(self, other, fields) -> bool:
+        return all(getattr(self, field) == getattr(other, field) for field in fields)
+
+
+class RoomView(View):
+    """
+    Snapshot of a room. Every player view has its own `version`, kept from the
+    previous snapshot while the player (and their user) is unchanged, so
+    per-player renders survive writes to the rest of the room.
+    """
+
+    def __init__(self, room, version: int, versions, previous=None):
+        super().__init__(room, ROOM_FIELDS)
+        self.version = version
+        self.players = []
+        old = {p.id: p for p in previous.players} if previous else {}
+        for player in room.players:
+            view = View(player, PLAYER_FIELDS)
+            view.user = View(player.user, USER_FIELDS)
+            before = old.get(view.id)
+            if before is not None and view.same_as(before, PLAYER_FIELDS) and view.user.same_as(before.user, USER_FIELDS):
+                view.version = before.version
+            else:
+                view.version = next(versions)
+            self.players.append(view)
+
+
+class RoomCache:
+    """
+    In-process cache of room aggregates (room + players + users) keyed by room code.
+    Handlers that write to a room must call `put` after committing so readers
+    see the new state; anything that changes rooms in bulk must `invalidate`.
+    Readers that load a room on a miss store it with `fill`, which drops the
+    snapshot if the room was put or invalidated while they were reading.
+    Finished rooms expire quickly, the least recently used rooms are evicted first.
+
+    Other processes' writes are never seen, so with several workers the cache is
+    turned off (ttl=0): `get` always misses and `put` only builds the snapshot.
+    """
+
+    def __init__(self, max_size: int = 2000, ttl: float = 600, finished_ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.finished_ttl = finished_ttl
+        self._entries = OrderedDict() # code -> (RoomView, expires_at)
+        # Versions are never reused, even across invalidations
+        self._versions = itertools.count(1)
+        # Number of the last write to each room, for `fill`. The oldest are forgotten:
+        # a forgotten room reports the newest forgotten number, which is never lower
+        self._writes = itertools.count(1)
+        self._generations = OrderedDict() # code -> write number
+        self._forgotten = 0
+        self._epoch = 0 # bumped by writes that can't name their rooms
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, code):
+        entry = self._entries.get(code)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[code]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(code)
+        self.hits += 1
+        return entry[0]
+
+    def generation(self, code):
+        """Token to take before reading a room from the DB and hand to `fill`."""
+        return (self._generations.get(code, self._forgotten), self._epoch)
+
+    def _written(self, code):
+        self._generations.pop(code, None)
+        self._generations[code] = next(self._writes)
+        while len(self._generations) > self.max_size * 4:
+            _, self._forgotten = self._generations.popitem(last=False)
+
+    def put(self, room) -> RoomView:
+        """Stores a fresh snapshot of a loaded Room (players and users must be loaded)."""
+        self._written(room.code)
+        return self._store(room)
+
+    def fill(self, room, generation) -> RoomView:
+        """
+        `put` for a room read on a miss: if it was written since `generation` was
+        taken, the rows may be older than the cache, so they are not stored and the
+        cached snapshot (or, without one, a view of the rows) is returned instead.
+        """
+        if self.generation(room.code) == generation:
+            return self._store(room)
+        entry = self._entries.get(room.code)
+        if entry is not None:
+            return entry[0]
+        return RoomView(room, next(self._versions), self._versions)
+
+    def _store(self, room) -> RoomView:
+        previous = self._entries.pop(room.code, None)
+        view = RoomView(room, next(self._versions), self._versions, previous and previous[0])
+        if self.ttl <= 0:
+            return view
+        ttl = self.finished_ttl if room.is_finished else self.ttl
+        self._entries[room.code] = (view, time.monotonic() + ttl)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return view
+
+    def invalidate(self, code):
+        self._written(code)
+        self._entries.pop(code, None)
+
+    def invalidate_where(self, predicate):
+        """Drops every cached room for which `predicate(view)` is true."""
+        # Rooms being read on a miss can't be checked, so none of them is stored
+        self._epoch += 1
+        for code in [code for code, (view, _) in self._entries.items() if predicate(view)]:
+            del self._entries[code]
+
+    def invalidate_user(self, user_id):
+        self.invalidate_where(lambda view: any(p.user_id == user_id for p in view.players))
+
+    def clear(self):
+        self._epoch += 1
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+room_cache = RoomCache(ttl=0) if config.WORKERS > 1 else RoomCache()
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+
+from ..config import config
+from .gemini import ai_service
+
+logger = logging.getLogger(__name__)
+
+
+class ScenarioPool:
+    """
+    Keeps a few ready-made scenarios per prompt (None = default prompt, otherwise a
+    pack's scenario_prompt) so start_game can take one in O(1). Pools refill in the
+    background with bounded concurrency; a miss falls back to live generation.
+    """
+
+    def __init__(self, ai, size: int = 3, concurrency: int = 2, batch_size: int = 3, max_prompts: int = 64):
+        self.ai = ai
+        self.size = size
+        self.batch_size = batch_size
+        self.max_prompts = max_prompts
+        self._pools = OrderedDict() # prompt -> deque of scenarios
+        self._refilling = {} # prompt -> refill task
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.hits = 0
+        self.misses = 0
+
+    def _pool(self, prompt) -> deque:
+        pool = self._pools.get(prompt)
+        if pool is None:
+            pool = self._pools[prompt] = deque()
+            # Forget the least recently used prompts (old or deleted packs)
+            while len(self._pools) > self.max_prompts:
+                self._pools.popitem(last=False)
+        else:
+            self._pools.move_to_end(prompt)
+        return pool
+
+    def take(self, prompt=None):
+        """A ready scenario, or None if the pool for this prompt is empty. Triggers a refill either way."""
+        pool = self._pool(prompt)
+        scenario = pool.popleft() if pool else None
+        if scenario is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.warm(prompt)
+        return scenario
+
+    async def get(self, prompt=None) -> str:
+        scenario = self.take(prompt)
+        if scenario is None:
+            scenario = await self.ai.generate_scenario(custom_prompt=prompt)
+        return scenario
+
+    def warm(self, prompt=None):
+        """Schedules a background refill of the pool for this prompt if it isn't full."""
+        if prompt in self._refilling or len(self._pool(prompt)) >= self.size:
+            return
+        task = asyncio.create_task(self._refill(prompt))
+        self._refilling[prompt] = task
+        task.add_done_callback(lambda _: self._refilling.pop(prompt, None))
+
+    async def _refill(self, prompt):
+        while prompt in self._pools and len(self._pools[prompt]) < self.size:
+            count = min(self.batch_size, self.size - len(self._pools[prompt]))
+            try:
+                async with self._semaphore:
+                    scenarios = await self.ai.generate_scenarios(count, custom_prompt=prompt)
+            except Exception as e:
+                logger.error(f"Scenario pool refill failed: {e}")
+                return
+            if not scenarios:
+                return
+            pool = self._pools.get(prompt)
+            if pool is None:
+                return
+            pool.extend(scenarios[:self.size - len(pool)])
+
+    async def close(self):
+        tasks = list(self._refilling.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+scenario_pool = ScenarioPool(
+    ai_service,
+    size=config.SCENARIO_POOL_SIZE,
+    concurrency=config.SCENARIO_POOL_CONCURRENCY,
+    batch_size=config.SCENARIO_BATCH_SIZE,
+)
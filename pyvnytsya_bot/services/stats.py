@@ -0,0 +1,41 @@
+import asyncio
+import logging
+
+from ..database.pool import pool_metrics
+from ..keyboards.cache import keyboard_cache
+from .room_cache import room_cache
+from .render_cache import render_cache
+from .pack_cache import pack_cache
+from .scenario_pool import scenario_pool
+from .gemini import ai_service
+from .room_actors import room_actors
+from .notifier import notifier
+from .edit_tracker import edit_tracker
+
+logger = logging.getLogger(__name__)
+
+
+def hit_rate(cache) -> str:
+    total = cache.hits + cache.misses
+    return f"{cache.hits}/{total}" + (f" ({cache.hits / total:.0%})" if total else "")
+
+
+def format_stats(db_middleware=None) -> str:
+    """One line per subsystem: DB pool, sessions, caches and Gemini."""
+    lines = [f"DB: {pool_metrics.format()}"]
+    if db_middleware is not None:
+        lines.append(f"Sessions: {db_middleware.db_updates} of {db_middleware.updates} updates needed the DB")
+    lines.append(f"Room cache: {hit_rate(room_cache)}, pack cache: {hit_rate(pack_cache)}, scenario pool: {hit_rate(scenario_pool)}, keyboards: {hit_rate(keyboard_cache)}")
+    lines.append(f"Player cards: {hit_rate(render_cache)}")
+    lines.append(f"Edits skipped: {hit_rate(edit_tracker)}, debounced: {edit_tracker.debounced}, failed: {edit_tracker.failed}")
+    lines.append(f"Room actors: {len(room_actors)}")
+    lines.append(f"Notifications: {notifier.events} in {notifier.sends} messages ({notifier.saved} sends saved)")
+    ai = ai_service.stats()
+    lines.append("AI: " + ", ".join(f"{key} {value}" for key, value in ai.items()))
+    return "\n".join(lines)
+
+
+async def log_stats_periodically(interval: float, db_middleware=None):
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(format_stats(db_middleware).replace("\n", " | "))
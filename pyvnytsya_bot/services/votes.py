@@ -0,0 +1,72 @@
+import random
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..database.models import Vote
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def vote_insert(session):
+    dialect = session.bind.dialect.name
+    insert = INSERTS.get(dialect)
+    if insert is None:
+        raise NotImplementedError(f"Votes need INSERT ... ON CONFLICT, not available for {dialect}")
+    return insert(Vote)
+
+
+async def cast_vote(session, room, voter, target) -> bool:
+    """Records voter's vote for this round. False if they have already voted (nothing is changed)."""
+    stmt = (
+        vote_insert(session)
+        .values(room_id=room.id, round_number=room.round_number, voter_id=voter.id, target_id=target.id, weight=voter.vote_weight or 1)
+        .on_conflict_do_nothing(index_elements=["room_id", "round_number", "voter_id"])
+        .returning(Vote.id)
+    )
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none() is not None
+
+
+async def cast_votes(session, room, votes):
+    """Records several (voter, target) votes in one statement; voters who already voted are skipped."""
+    if not votes:
+        return
+    stmt = (
+        vote_insert(session)
+        .values([
+            {"room_id": room.id, "round_number": room.round_number, "voter_id": voter.id, "target_id": target.id, "weight": voter.vote_weight or 1}
+            for voter, target in votes
+        ])
+        .on_conflict_do_nothing(index_elements=["room_id", "round_number", "voter_id"])
+    )
+    await session.execute(stmt)
+
+
+async def tally(session, room) -> dict:
+    """{target player id: total vote weight} for the room's current round, in one aggregate query."""
+    result = await session.execute(
+        select(Vote.target_id, func.sum(Vote.weight))
+        .where(Vote.room_id == room.id, Vote.round_number == room.round_number)
+        .group_by(Vote.target_id)
+    )
+    return {target_id: total for target_id, total in result.all()}
+
+
+async def voter_ids(session, room) -> set:
+    """Ids of the players who have voted in the room's current round (committed by anyone)."""
+    result = await session.execute(
+        select(Vote.voter_id).where(Vote.room_id == room.id, Vote.round_number == room.round_number)
+    )
+    return set(result.scalars().all())
+
+
+def pick_loser(candidates, totals: dict):
+    """Candidate with the most votes and whether it was a tie (ties are broken at random)."""
+    best = max(totals.get(p.id, 0) for p in candidates)
+    leaders = [p for p in candidates if totals.get(p.id, 0) == best]
+    return random.choice(leaders), len(leaders) > 1
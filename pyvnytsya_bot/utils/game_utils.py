@@ -20,6 +20,42 @@ def get_random_action_cards():
         return [random.choice(ACTION_CARDS)]
     return []
 
+def deal_action_cards():
+    """Random action cards with their `used` state, ready to store on a player."""
+    return [dict(card, used=False) for card in get_random_action_cards()]
+
+def use_card(cards, index):
+    """Copy of `cards` with card `index` marked as used (a new list, so the change is flushed)."""
+    cards = list(cards)
+    cards[index] = dict(cards[index], used=True)
+    return cards
+
+# Revealed traits are stored as a bitmask over TRAIT_KEYS.
+# The order is persisted in the DB: only ever append new keys.
+TRAIT_KEYS = ("profession", "health", "hobby", "phobia", "inventory", "fact", "bio", "age")
+TRAIT_BITS = {key: 1 << i for i, key in enumerate(TRAIT_KEYS)}
+ALL_TRAITS_MASK = (1 << len(TRAIT_KEYS)) - 1
+_REVEALED_SETS = [frozenset(key for key in TRAIT_KEYS if mask & TRAIT_BITS[key]) for mask in range(ALL_TRAITS_MASK + 1)]
+
+def revealed_traits(mask):
+    """Frozenset of trait keys revealed in `mask` (precomputed, no allocation)."""
+    return _REVEALED_SETS[(mask or 0) & ALL_TRAITS_MASK]
+
+def reveal_trait(mask, trait):
+    return (mask or 0) | TRAIT_BITS[trait]
+
+def hide_trait(mask, trait):
+    return (mask or 0) & ~TRAIT_BITS[trait]
+
+def traits_to_mask(traits):
+    """Mask from trait keys, or from the legacy comma separated string. Unknown keys are ignored."""
+    if isinstance(traits, str):
+        traits = traits.split(",")
+    mask = 0
+    for trait in traits:
+        mask |= TRAIT_BITS.get(trait.strip(), 0)
+    return mask
+
 # Format: (Value, Weight)
 # Higher weight = higher chance
 
@@ -244,44 +280,109 @@ BIO = [
     ("Бісексуал", 3), ("Гетеросексуал", 40), ("Бойовий вертоліт", 1)
 ]
 
+class TraitSampler:
+    """
+    Walker/Vose alias table over a weighted trait list.
+    Building is O(n) once, every draw afterwards is O(1).
+    """
+
+    __slots__ = ("values", "prob", "alias")
+
+    def __init__(self, traits_list):
+        # Handle both list of tuples (value, weight) and list of dicts {"name": value, "weight": weight}
+        if traits_list and isinstance(traits_list[0], dict):
+            values = [t["name"] for t in traits_list]
+            weights = [t.get("weight", 1) for t in traits_list]
+        else:
+            values = [t[0] for t in traits_list]
+            weights = [t[1] for t in traits_list]
+
+        n = len(values)
+        total = sum(weights)
+        if total <= 0:
+            weights = [1] * n
+            total = n
+
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, w in enumerate(scaled) if w < 1]
+        large = [i for i, w in enumerate(scaled) if w >= 1]
+
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            if scaled[l] < 1:
+                small.append(l)
+            else:
+                large.append(l)
+        # Whatever is left over is (up to rounding) exactly 1
+        for i in small + large:
+            prob[i] = 1.0
+
+        self.values = values
+        self.prob = prob
+        self.alias = alias
+
+    def sample(self):
+        if not self.values: return "Нічого"
+        u = random.random() * len(self.values)
+        i = int(u)
+        return self.values[i] if u - i < self.prob[i] else self.values[self.alias[i]]
+
+# characteristic -> (pack data key, default table)
+TRAIT_TABLES = {
+    "profession": ("professions", PROFESSIONS),
+    "health": ("health", HEALTH),
+    "hobby": ("hobby", HOBBIES),
+    "phobia": ("phobia", PHOBIAS),
+    "inventory": ("inventory", INVENTORY),
+    "fact": ("fact", FACTS),
+    "bio": ("bio", BIO),
+}
+
+DEFAULT_SAMPLERS = {key: TraitSampler(table) for key, (_, table) in TRAIT_TABLES.items()}
+_SAMPLERS_BY_TABLE = {id(TRAIT_TABLES[key][1]): sampler for key, sampler in DEFAULT_SAMPLERS.items()}
+
 def get_random_trait(traits_list):
-    # Handle both list of tuples (value, weight) and list of dicts {"name": value, "weight": weight}
     if not traits_list: return "Нічого"
-    
-    first = traits_list[0]
-    if isinstance(first, dict):
-        choices = [t["name"] for t in traits_list]
-        weights = [t.get("weight", 1) for t in traits_list]
-    else:
-        choices = [t[0] for t in traits_list]
-        weights = [t[1] for t in traits_list]
-        
-    return random.choices(choices, weights=weights, k=1)[0]
-
-def generate_characteristics(pack_data=None):
-    if pack_data:
-        return {
-            "profession": get_random_trait(pack_data.get("professions", PROFESSIONS)),
-            "health": get_random_trait(pack_data.get("health", HEALTH)),
-            "hobby": get_random_trait(pack_data.get("hobby", HOBBIES)),
-            "phobia": get_random_trait(pack_data.get("phobia", PHOBIAS)),
-            "inventory": get_random_trait(pack_data.get("inventory", INVENTORY)),
-            "fact": get_random_trait(pack_data.get("fact", FACTS)),
-            "age": random.randint(18, 90),
-            "bio": get_random_trait(pack_data.get("bio", BIO))
-        }
-        
+    sampler = _SAMPLERS_BY_TABLE.get(id(traits_list))
+    if sampler is None:
+        sampler = TraitSampler(traits_list)
+    return sampler.sample()
+
+def compile_pack(pack_data=None):
+    """Alias tables for every characteristic, using pack lists where the pack defines them."""
+    if not pack_data:
+        return DEFAULT_SAMPLERS
+    samplers = {}
+    for key, (pack_key, _) in TRAIT_TABLES.items():
+        traits_list = pack_data.get(pack_key)
+        samplers[key] = TraitSampler(traits_list) if traits_list is not None else DEFAULT_SAMPLERS[key]
+    return samplers
+
+def generate_characteristics(pack_data=None, samplers=None):
+    if samplers is None:
+        samplers = compile_pack(pack_data)
     return {
-        "profession": get_random_trait(PROFESSIONS),
-        "health": get_random_trait(HEALTH),
-        "hobby": get_random_trait(HOBBIES),
-        "phobia": get_random_trait(PHOBIAS),
-        "inventory": get_random_trait(INVENTORY),
-        "fact": get_random_trait(FACTS),
+        "profession": samplers["profession"].sample(),
+        "health": samplers["health"].sample(),
+        "hobby": samplers["hobby"].sample(),
+        "phobia": samplers["phobia"].sample(),
+        "inventory": samplers["inventory"].sample(),
+        "fact": samplers["fact"].sample(),
         "age": random.randint(18, 90),
-        "bio": get_random_trait(BIO)
+        "bio": samplers["bio"].sample()
     }
 
+def deal_characteristics(count, pack_data=None, samplers=None):
+    """Characteristics for a whole room at once; the pack is compiled a single time."""
+    if samplers is None:
+        samplers = compile_pack(pack_data)
+    return [generate_characteristics(samplers=samplers) for _ in range(count)]
+
 def escape_markdown(text):
     """Escapes special characters for Telegram Markdown (legacy)."""
     if not text: return ""
@@ -289,7 +390,7 @@ def escape_markdown(text):
 
 def format_player_card(player, show_hidden=False):
     """Formats player card. If show_hidden is False, hides unrevealed traits."""
-    revealed = player.revealed_traits.split(",") if player.revealed_traits else []
+    revealed = revealed_traits(player.revealed_mask)
     
     def get_trait(key, label, value):
         if show_hidden or key in revealed:
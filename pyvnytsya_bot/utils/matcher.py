@@ -0,0 +1,73 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over several keyword families.
+    `classify(text)` returns the names of every family that has at least one
+    keyword occurring in the text (case-insensitive substring match), in a
+    single pass over the text.
+    """
+
+    def __init__(self, families: dict, memo_size: int = 4096):
+        self._goto = [{}]
+        outputs = [set()]
+
+        for family, keywords in families.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                node = 0
+                for ch in keyword:
+                    nxt = self._goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[node][ch] = nxt
+                        self._goto.append({})
+                        outputs.append(set())
+                    node = nxt
+                outputs[node].add(family)
+
+        # Breadth-first pass to build failure links and merge outputs along them
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                outputs[nxt] |= outputs[self._fail[nxt]]
+
+        self._out = [frozenset(o) for o in outputs]
+        self._memo = {}
+        self._memo_size = memo_size
+
+    def classify(self, text) -> frozenset:
+        if not text:
+            return frozenset()
+        text = str(text)
+        cached = self._memo.get(text)
+        if cached is not None:
+            return cached
+
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        found = set()
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+
+        result = frozenset(found)
+        # Trait values repeat a lot across games, so remember recent answers
+        if len(self._memo) >= self._memo_size:
+            self._memo.clear()
+        self._memo[text] = result
+        return result
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """
+    SimpleRequestHandler that answers Telegram right away, handles the update in
+    the background, and on shutdown waits (up to `drain_timeout` seconds) for
+    those updates to finish. Unlike SimpleRequestHandler it leaves the bot session
+    open: the dispatcher's shutdown hooks still send, so run_webhook closes it last.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, drain_timeout: float = 30.0, **kwargs):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self.drain_timeout = drain_timeout
+
+    async def close(self) -> None:
+        tasks = set(self._background_feed_update_tasks)
+        if tasks:
+            logger.info(f"Waiting for {len(tasks)} updates in progress")
+            _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Cancelled {len(pending)} updates still running after {self.drain_timeout}s")
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, config):
+    """Serves updates over HTTP until cancelled. Registers the webhook with Telegram if WEBHOOK_URL is set."""
+    secret = config.WEBHOOK_SECRET.get_secret_value() if config.WEBHOOK_SECRET else None
+    if not secret:
+        # Without it anyone who finds the URL can post fake updates
+        raise ValueError("RUN_MODE=webhook needs WEBHOOK_SECRET")
+
+    if config.WEBHOOK_URL:
+        async def register_webhook(bot: Bot):
+            await bot.set_webhook(
+                config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+                secret_token=secret,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+        dp.startup.register(register_webhook)
+
+    app = web.Application()
+    DrainingRequestHandler(
+        dp, bot, secret_token=secret, drain_timeout=config.WEBHOOK_DRAIN_TIMEOUT,
+    ).register(app, path=config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    async def close_session(app: web.Application):
+        await bot.session.close()
+    # Shutdown runs the drain, then the dispatcher's shutdown hooks; cleanup comes after both
+    app.on_cleanup.append(close_session)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBAPP_HOST, config.WEBAPP_PORT)
+    await site.start()
+    logger.info(f"Listening for webhook updates on {config.WEBAPP_HOST}:{config.WEBAPP_PORT}{config.WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        # Stops accepting requests, then runs the shutdown hooks (drain, dispatcher shutdown) and closes the session
+        await runner.cleanup()
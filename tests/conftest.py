@@ -0,0 +1,13 @@
+import os
+import sys
+
+# Add project root (and the benchmarks, whose fakes the tests reuse) to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+# The config requires these; the tests never talk to Telegram, Postgres or Gemini
+for key, value in {
+    "BOT_TOKEN": "0:tests", "GEMINI_API_KEY": "tests", "DB_HOST": "localhost",
+    "DB_PORT": "5432", "DB_USER": "tests", "DB_PASS": "tests", "DB_NAME": "tests",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,41 @@
+import asyncio
+
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import EditMessageText
+
+from simulate_games import FakeBot, FakeMessage
+
+from pyvnytsya_bot.services.edit_tracker import EditTracker
+
+
+class UnreachableMessage(FakeMessage):
+    async def edit_text(self, text, **kwargs):
+        raise TelegramNetworkError(EditMessageText(text=text), "connection reset")
+
+
+class BrokenMessage(FakeMessage):
+    """Breaks after its first edit."""
+
+    async def edit_text(self, text, **kwargs):
+        if self.text != "старий":
+            raise RuntimeError("boom")
+        return await super().edit_text(text, **kwargs)
+
+
+def test_close_sends_every_pending_edit_despite_failures():
+    async def body():
+        bot = FakeBot()
+        tracker = EditTracker(debounce=60)
+        messages = [UnreachableMessage(bot, 1, 1, "старий"), BrokenMessage(bot, 1, 2, "старий"), FakeMessage(bot, 1, 3, "старий")]
+        for message in messages:
+            await tracker.edit(message, "перший")
+            # Within the debounce interval: waits for close()
+            await tracker.edit(message, "другий")
+        await tracker.close()
+        return tracker, messages
+
+    tracker, messages = asyncio.run(body())
+
+    assert messages[2].text == "другий"
+    assert tracker.failed == 2 # both edits of the unreachable message; the broken one's error is only logged
+    assert all(tracked.pending is None and tracked.timer is None for tracked in tracker._messages.values())
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from pyvnytsya_bot.services.fsm_storage import RedisHashStorage
+from pyvnytsya_bot.states.game_states import JoinRoom
+
+fakeredis = pytest.importorskip("fakeredis")
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+
+def run(test):
+    async def body():
+        storage = RedisHashStorage(fakeredis.FakeAsyncRedis(), ttl=100)
+        try:
+            await test(storage, storage.key_builder.build(KEY))
+        finally:
+            await storage.close()
+    asyncio.run(body())
+
+
+def test_set_get_and_clear():
+    async def test(storage, name):
+        await storage.set_state(KEY, JoinRoom.waiting_for_code)
+        await storage.set_data(KEY, {"code": "ABC123"})
+        assert await storage.get_state(KEY) == JoinRoom.waiting_for_code.state
+        assert await storage.get_data(KEY) == {"code": "ABC123"}
+
+        await storage.set_state(KEY, None)
+        await storage.set_data(KEY, {})
+        assert await storage.get_state(KEY) is None
+        assert await storage.get_data(KEY) == {}
+        assert not await storage.redis.exists(name) # a cleared flow leaves no key behind
+    run(test)
+
+
+def test_every_write_refreshes_the_ttl():
+    async def test(storage, name):
+        await storage.set_state(KEY, JoinRoom.waiting_for_code)
+        assert 0 < await storage.redis.ttl(name) <= 100
+
+        await storage.redis.expire(name, 5)
+        await storage.set_data(KEY, {"code": "ABC123"})
+        assert await storage.redis.ttl(name) > 5
+
+        await storage.redis.expire(name, 5)
+        await storage.set_state(KEY, JoinRoom.waiting_for_code)
+        assert await storage.redis.ttl(name) > 5
+    run(test)
+
+
+def test_get_data_reuses_the_state_read():
+    async def test(storage, name):
+        await storage.set_data(KEY, {"code": "ABC123"})
+        await storage.get_state(KEY)
+        await storage.redis.hset(name, "data", '{"code": "CHANGED"}')
+        # Served from the HMGET done by get_state, without a second round trip
+        assert await storage.get_data(KEY) == {"code": "ABC123"}
+        # Only once: the next read goes to Redis
+        assert await storage.get_data(KEY) == {"code": "CHANGED"}
+
+        await storage.get_state(KEY)
+        await storage.set_data(KEY, {"code": "NEW"}) # our own write drops the prefetched data
+        assert await storage.get_data(KEY) == {"code": "NEW"}
+    run(test)
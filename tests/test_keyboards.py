@@ -0,0 +1,80 @@
+import pytest
+
+from pyvnytsya_bot.handlers import callbacks
+from pyvnytsya_bot.keyboards import inline
+from pyvnytsya_bot.keyboards.callbacks import unpack
+from pyvnytsya_bot.utils.game_utils import deal_action_cards
+
+CODE = "ABC123"
+
+
+class Obj:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+PLAYERS = [
+    Obj(id=1, is_alive=True, user=Obj(full_name="Гравець", username="p1")),
+    Obj(id=2, is_alive=False, user=Obj(full_name=None, username="p2")),
+]
+PACKS = [Obj(id=7, name="Мій пак", user_id=1000), Obj(id=8, name="Публічний", user_id=1)]
+
+# Buttons that have never had a handler (the dispatcher answers that they are outdated)
+UNHANDLED = {"leave_room"}
+
+# Every builder in keyboards.inline, with arguments that reach all of its buttons
+BUILDERS = {
+    "main_menu": (),
+    "room_creator_menu": (CODE,),
+    "room_player_menu": (CODE,),
+    "back_to_main": (),
+    "game_dashboard": (CODE, "discussion", True, True),
+    "reveal_menu": (CODE, 0),
+    "voting_menu": (CODE, PLAYERS),
+    "admin_game_menu": (CODE,),
+    "settings_menu": (CODE,),
+    "packs_menu": (CODE, PACKS, 1000),
+    "action_cards_menu": (CODE, deal_action_cards()),
+    "target_selection_menu": (CODE, PLAYERS, 0),
+}
+
+
+def test_every_builder_is_listed():
+    builders = {
+        name for name, value in vars(inline).items()
+        if callable(value) and getattr(value, "__module__", None) == inline.__name__
+    }
+    assert builders == set(BUILDERS)
+
+
+@pytest.mark.parametrize("name", sorted(BUILDERS))
+def test_builder_buttons_route_to_handlers(name):
+    markup = getattr(inline, name)(*BUILDERS[name])
+
+    buttons = [button for row in markup.inline_keyboard for button in row]
+    assert buttons
+    for button in buttons:
+        assert len(button.callback_data.encode()) <= 64
+        action, fields = unpack(button.callback_data)
+        assert action in callbacks.handlers or action in UNHANDLED, f"{name}: no handler for {action}"
+        if "code" in fields:
+            assert fields["code"] == CODE
+
+
+def test_packs_menu_lists_packs_with_delete_for_own():
+    markup = inline.packs_menu(CODE, PACKS, 1000)
+
+    payloads = [unpack(button.callback_data) for row in markup.inline_keyboard for button in row]
+    assert ("set_pack", {"pack_id": 0, "code": CODE}) in payloads
+    assert [fields["pack_id"] for action, fields in payloads if action == "set_pack"] == [0, 7, 8]
+    assert [fields["pack_id"] for action, fields in payloads if action == "delete_pack"] == [7]
+
+
+def test_cached_markups_are_not_shared():
+    first = inline.game_dashboard(CODE, "revealing", True, False)
+    first.inline_keyboard[0][0].text = "змінено"
+    first.inline_keyboard.append([])
+
+    second = inline.game_dashboard(CODE, "revealing", True, False)
+    assert second is not first
+    assert second == inline.game_dashboard.uncached(CODE, "revealing", True, False)
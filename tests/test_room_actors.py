@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from pyvnytsya_bot.services.room_actors import RoomActors
+
+
+def test_a_cancelled_job_does_not_stop_the_room():
+    async def body():
+        actors = RoomActors()
+
+        async def cancelled():
+            # e.g. a job awaiting a task someone else cancelled
+            raise asyncio.CancelledError()
+
+        async def ok():
+            return "ok"
+
+        first = asyncio.create_task(actors.run("ROOM", cancelled))
+        second = asyncio.create_task(actors.run("ROOM", ok))
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        result = await asyncio.wait_for(second, 1)
+        await actors.close()
+        return result
+
+    assert asyncio.run(body()) == "ok"
+
+
+def test_a_cancelled_worker_forgets_its_room():
+    async def body():
+        actors = RoomActors()
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.Event().wait()
+
+        async def ok():
+            return "ok"
+
+        running = asyncio.create_task(actors.run("ROOM", hang))
+        queued = asyncio.create_task(actors.run("ROOM", ok))
+        await started.wait()
+        actors._workers["ROOM"].cancel()
+        # Both callers hear about it instead of waiting forever
+        for caller in (running, queued):
+            with pytest.raises(asyncio.CancelledError):
+                await asyncio.wait_for(caller, 1)
+        left = len(actors)
+        result = await asyncio.wait_for(actors.run("ROOM", ok), 1)
+        await actors.close()
+        return left, result
+
+    assert asyncio.run(body()) == (0, "ok")
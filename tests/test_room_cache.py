@@ -0,0 +1,104 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from pyvnytsya_bot.database.base import Base
+from pyvnytsya_bot.database.models import Room, Player, User
+from pyvnytsya_bot.handlers import game
+from pyvnytsya_bot.services.room_cache import RoomCache, room_cache
+
+CODE = "CACHE1"
+
+
+async def open_room(tmp_path):
+    """A room still in registration, not in the cache."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/rooms.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_pool = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_pool() as session:
+        session.add_all(User(id=1000 + i, username=f"p{i}", full_name=f"Гравець {i}") for i in range(2))
+        room = Room(code=CODE, creator_id=1000)
+        room.players = [Player(user_id=1000 + i, action_cards=[]) for i in range(2)]
+        session.add(room)
+        await session.commit()
+    room_cache.clear()
+    return engine, session_pool
+
+
+def test_a_miss_does_not_overwrite_a_concurrent_write(tmp_path, monkeypatch):
+    async def body():
+        engine, session_pool = await open_room(tmp_path)
+        read, resume = asyncio.Event(), asyncio.Event()
+        load = game.get_room_with_players
+
+        async def slow_load(session, code):
+            # The reader has its rows and stalls before storing them
+            room = await load(session, code)
+            read.set()
+            await resume.wait()
+            return room
+
+        async def reader():
+            async with session_pool() as session:
+                monkeypatch.setattr(game, "get_room_with_players", slow_load)
+                try:
+                    return await game.get_room_view(session, CODE)
+                finally:
+                    monkeypatch.setattr(game, "get_room_with_players", load)
+
+        async def writer():
+            await read.wait()
+            async with session_pool() as session:
+                room = await load(session, CODE)
+                room.is_active, room.phase = True, "revealing"
+                await session.commit()
+                written = room_cache.put(room)
+            resume.set()
+            return written
+
+        seen, written = await asyncio.gather(reader(), writer())
+        cached = room_cache.get(CODE)
+        await engine.dispose()
+        return seen, written, cached
+
+    seen, written, cached = asyncio.run(body())
+
+    assert cached is written
+    assert (cached.phase, cached.is_active) == ("revealing", True)
+    assert seen is written # the reader gets the newer snapshot, not its own rows
+
+
+class Rows:
+    def __init__(self, code):
+        self.code = code
+        self.is_finished = False
+        self.players = []
+        for field in ("id", "creator_id", "is_active", "round_number", "phase", "survivors_count", "scenario", "pack_id"):
+            setattr(self, field, None)
+
+
+def test_fill_is_dropped_after_any_write():
+    cache = RoomCache(max_size=2)
+
+    generation = cache.generation("A")
+    cache.invalidate("A")
+    cache.fill(Rows("A"), generation)
+    assert cache.get("A") is None
+
+    generation = cache.generation("A")
+    cache.invalidate_where(lambda view: False)
+    cache.fill(Rows("A"), generation)
+    assert cache.get("A") is None
+
+    # Writes to many other rooms push "A" out of the generations; it still counts as written
+    generation = cache.generation("A")
+    cache.invalidate("A")
+    for code in range(20):
+        cache.invalidate(code)
+    cache.fill(Rows("A"), generation)
+    assert cache.get("A") is None
+
+    generation = cache.generation("A")
+    view = cache.fill(Rows("A"), generation)
+    assert cache.get("A") is view
@@ -0,0 +1,36 @@
+import asyncio
+import random
+
+import pytest
+
+from simulate_games import Simulator
+
+from pyvnytsya_bot.handlers import game
+from pyvnytsya_bot.services.edit_tracker import edit_tracker
+from pyvnytsya_bot.services.notifier import notifier
+from pyvnytsya_bot.services.scenario_pool import scenario_pool
+
+
+async def play(humans: int, bots: int, monkeypatch) -> Simulator:
+    sim = Simulator(humans, bots)
+    await sim.setup()
+    monkeypatch.setattr(game, "finish_voting", sim.measure("finish_voting", game.finish_voting))
+    try:
+        random.seed(1)
+        assert await sim.play(0)
+    finally:
+        await notifier.close()
+        await edit_tracker.close()
+        await scenario_pool.close()
+        await sim.engine.dispose()
+    return sim
+
+
+@pytest.mark.parametrize("bots", [2, 12])
+def test_round_transitions_stay_within_budget(bots, monkeypatch):
+    sim = asyncio.run(play(4, bots, monkeypatch))
+
+    for name in ("start_voting_phase", "finish_voting"):
+        assert sim.stats.per_call[name], f"{name} never ran"
+    assert sim.over_budget() == []
+
@@ -0,0 +1,124 @@
+import asyncio
+import random
+from collections import Counter
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from simulate_games import FakeBot
+
+from pyvnytsya_bot.database.base import Base
+from pyvnytsya_bot.database.models import Room, Player, User, Vote
+from pyvnytsya_bot.handlers import game
+from pyvnytsya_bot.services.broadcaster import broadcaster
+from pyvnytsya_bot.services.notifier import notifier
+from pyvnytsya_bot.services.votes import cast_vote, cast_votes, tally, pick_loser
+
+CODE = "VOTE01"
+PLAYERS = 8
+
+
+async def open_room(tmp_path):
+    """A room in its first voting round. Player 2 has a double vote."""
+    # A file with a connection per session, so a rolled back duplicate can't touch anyone else's transaction
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/votes.db", connect_args={"timeout": 60})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_pool = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_pool() as session:
+        session.add_all(User(id=1000 + i, username=f"p{i}", full_name=f"Гравець {i}") for i in range(PLAYERS))
+        room = Room(code=CODE, creator_id=1000, is_active=True, round_number=1, phase="voting", survivors_count=2, scenario="Тест")
+        room.players = [
+            Player(user_id=1000 + i, action_cards=[], vote_weight=2 if i == 2 else 1) for i in range(PLAYERS)
+        ]
+        session.add(room)
+        await session.commit()
+    broadcaster.set_limits(global_rate=1e9, per_chat_rate=1e9, per_chat_burst=1e9)
+    return engine, session_pool
+
+
+def test_concurrent_duplicate_votes_are_counted_once(tmp_path):
+    async def body():
+        engine, session_pool = await open_room(tmp_path)
+        async with session_pool() as session:
+            room = await game.get_room_with_players(session, CODE)
+        players = room.players
+        # Everyone votes against player 1, who votes against player 2
+        targets = {p.id: players[2] if p is players[1] else players[1] for p in players}
+
+        async def vote(voter):
+            async with session_pool() as session:
+                recorded = await cast_vote(session, room, voter, targets[voter.id])
+                await session.commit()
+                return recorded
+
+        # Double taps and retries, all at once
+        attempts = [p for p in players for _ in range(3)]
+        random.shuffle(attempts)
+        results = await asyncio.gather(*(vote(p) for p in attempts))
+
+        async with session_pool() as session:
+            totals = await tally(session, room)
+            votes = (await session.execute(select(Vote))).scalars().all()
+        await engine.dispose()
+        return players, Counter(p.id for p, recorded in zip(attempts, results) if recorded), totals, votes
+
+    players, recorded, totals, votes = asyncio.run(body())
+
+    assert recorded == {p.id: 1 for p in players}
+    assert Counter(v.voter_id for v in votes) == {p.id: 1 for p in players}
+    # Six single votes and player 2's double one
+    assert totals == {players[1].id: PLAYERS - 2 + 2, players[2].id: 1}
+    assert pick_loser(players, totals) == (players[1], False)
+
+
+def test_pick_loser_breaks_ties_among_the_leaders():
+    class Candidate:
+        def __init__(self, id):
+            self.id = id
+
+    candidates = [Candidate(i) for i in range(4)]
+    random.seed(0)
+    losers = {pick_loser(candidates, {1: 3, 2: 3, 3: 1})[0].id for _ in range(50)}
+
+    assert losers == {1, 2}
+    assert pick_loser(candidates, {1: 3, 2: 3})[1] is True
+    assert pick_loser(candidates, {})[1] is True # nobody voted: everyone is tied at 0
+
+
+def test_only_one_concurrent_finisher_claims_the_round(tmp_path, monkeypatch):
+    async def body():
+        engine, session_pool = await open_room(tmp_path)
+        async with session_pool() as session:
+            room = await game.get_room_with_players(session, CODE)
+            await cast_votes(session, room, [(p, room.players[1]) for p in room.players if p is not room.players[1]])
+            await session.commit()
+
+        resets = 0
+        reset_players = game.update_players
+        async def count_resets(session, room, **values):
+            # finish_voting resets the players once per round it has claimed
+            nonlocal resets
+            resets += 1
+            return await reset_players(session, room, **values)
+        monkeypatch.setattr(game, "update_players", count_resets)
+
+        # Both finishers have loaded the room in phase 'voting' before either claims it
+        bot = FakeBot()
+        sessions = [session_pool() for _ in range(2)]
+        rooms = [await game.get_room_with_players(session, CODE) for session in sessions]
+        await asyncio.gather(*(game.finish_voting(room, session, bot) for room, session in zip(rooms, sessions)))
+        for session in sessions:
+            await session.close()
+        await notifier.close()
+
+        async with session_pool() as session:
+            room = await game.get_room_with_players(session, CODE)
+        await engine.dispose()
+        return resets, room
+
+    resets, room = asyncio.run(body())
+
+    assert resets == 1
+    assert (room.round_number, room.phase) == (2, "revealing")
+    assert [p.user_id for p in room.players if not p.is_alive] == [1001]